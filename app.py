@@ -12,6 +12,7 @@ from src.app.ui_component import (display_title,
                                   display_chat_interface
                                   )
 from src.app.chat_interface import handle_chat
+from src.utils.rate_limiter import admission_stats
 
 # Define main application function
 def main():
@@ -60,6 +61,14 @@ def main():
         st.markdown(f"**Current Agent:** {st.session_state.agent_handler.active_agent.title.upper()}")
         st.markdown(f"**Role:** {st.session_state.agent_handler.active_agent.role}")
 
+        # LLM admission control (shared by all sessions)
+        st.markdown('### LLM Queues')
+        stats = admission_stats()
+        if stats:
+            st.dataframe(stats, use_container_width=True)
+        else:
+            st.markdown('No LLM calls yet.')
+
     # About Tab
     # ------------
     with tab_about:
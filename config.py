@@ -10,3 +10,72 @@ class APP_MODE(Enum):
     MENU = auto()
     QUERY = auto()
     RESPONSE = auto()
+
+# Default token budget for the chat history sent with each prompt (override per agent with `history_tokens`)
+DEFAULT_HISTORY_TOKENS = 4000
+
+# Shared HTTP connection pool used by every LLM client in the process (see LLMRegistry)
+HTTP_POOL_LIMITS = {
+    'max_connections': 100,
+    'max_keepalive_connections': 20,
+    'keepalive_expiry': 60.0,
+}
+HTTP_TIMEOUT = 120.0
+
+# Persistent exact-match LLM response cache (opt in per agent with `response_cache: true`)
+RESPONSE_CACHE = {
+    'path': '.cache/responses.sqlite',
+    'ttl_seconds': 7 * 24 * 3600,
+    'max_entries': 20000,
+    'max_bytes': 256 * 1024 * 1024,
+}
+
+# Semantic answer cache for retrieval agents (opt in per agent with a `semantic_cache` block)
+SEMANTIC_CACHE = {
+    'path': '.cache/semantic.sqlite',
+    'max_entries_per_scope': 1000,
+    'ttl_seconds': 7 * 24 * 3600,
+}
+
+# Local chunk / full-document stores, one SQLite file per vector index (filled at ingest time)
+DOC_STORE_DIR = 'data/doc_store'
+
+# Shared query / document embeddings with an in-process LRU and a persistent SQLite tier
+EMBEDDINGS = {
+    'model': 'text-embedding-ada-002',
+    'path': '.cache/embeddings.sqlite',
+    'lru_size': 4096,
+    'batch_size': 64,    # micro-batch of query embeddings shared across sessions
+    'batch_wait': 0.005,  # seconds a micro-batch stays open
+    'batch_workers': 4,   # micro-batches embedded in parallel
+    'batch_timeout': HTTP_TIMEOUT,  # seconds a caller waits for its micro-batch
+}
+
+# Default location of local vector indexes (`vector_store: {backend: local}` in agents.yaml)
+VECTOR_STORE_DIR = 'data/vector_store'
+
+# Defaults for the ingestion command (`python -m src.rag.ingest`)
+INGEST = {
+    'chunk_size': 500,
+    'chunk_overlap': 50,
+    'batch_size': 100,
+    'concurrency': 4,
+    'checkpoint_every': 10,
+    'manifest_dir': 'data/manifest',
+}
+
+# BM25 lexical indexes for hybrid retrieval, one SQLite file per vector index (filled at ingest time)
+LEXICAL_INDEX_DIR = 'data/lexical'
+
+# Process-wide admission control for LLM calls, per model (see src/utils/rate_limiter.py).
+# Models without an entry use 'default'; an entry only needs the keys it overrides.
+LLM_RATE_LIMITS = {
+    'default': {
+        'max_concurrency': 8,       # calls in flight at once
+        'rpm': 500,                 # requests per minute
+        'tpm': 30000,               # prompt + completion tokens per minute
+        'completion_tokens': 512,   # completion estimate for calls without max_tokens
+        'acquire_timeout': 300.0,   # seconds a call may wait for admission before failing
+    },
+    'gpt-4-0613': {'tpm': 10000},
+}
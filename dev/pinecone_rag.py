@@ -14,6 +14,8 @@ from langchain_pinecone import PineconeVectorStore
 from langchain_core.prompts import PromptTemplate
 from langchain_core.runnables import RunnablePassthrough
 import time
+from src.rag.doc_store import get_doc_store
+from src.rag.embeddings import get_embeddings
 
 
 # %%
@@ -42,12 +44,20 @@ index = pc.Index(index_name)
 
 pdf_loader = PyPDFLoader("documents/building_llm_applications_book.pdf")
 text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-embeddings_model = OpenAIEmbeddings()
+embeddings_model = get_embeddings()
 
 # Load and split the PDF
 pdf_documents = pdf_loader.load()
 pdf_chunks = text_splitter.split_documents(pdf_documents)
 
+# Number chunks per source so documents can be reassembled in order
+chunk_counts = {}
+for chunk in pdf_chunks:
+    source = chunk.metadata['source']
+    chunk.metadata['chunk_id'] = chunk_counts.get(source, 0)
+    chunk.metadata['file_name'] = os.path.basename(source)
+    chunk_counts[source] = chunk.metadata['chunk_id'] + 1
+
 print(f"Number of chunks: {len(pdf_chunks)}")
 
 if pdf_chunks:
@@ -62,6 +72,9 @@ vector_store = PineconeVectorStore(index=index, embedding=embeddings_model)
 # Add documents to the vector store
 vector_store.add_documents(pdf_chunks)
 
+# Fill the local document store so full documents can be read without querying the index
+get_doc_store(index_name).add_documents(pdf_chunks)
+
 
 # %%
 from langchain_openai import ChatOpenAI
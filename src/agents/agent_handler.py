@@ -5,10 +5,21 @@ from src.agents.agent_registry import AgentRegistry
 from src.agents.base_agent import BaseAgent
 import importlib
 import typer
+from collections import OrderedDict
 
 class AgentHandler:
-    def __init__(self, config_path: str):
+    """
+    Creates and tracks the active agent.
+
+    Built agents are kept in an LRU pool keyed by (title, model) so switching back to an agent, or
+    back to a model, reuses the existing instance (LLM clients, chains, vector stores) instead of
+    rebuilding it. The pool holds at most `pool_size` agents; the least recently used is evicted.
+    A reused agent has its per-session state (role, memory) reset, so it behaves like a fresh build.
+    """
+    def __init__(self, config_path: str, pool_size: int = 4):
         self.config_path = config_path
+        self.pool_size = pool_size
+        self._agent_pool = OrderedDict()
         self._ensure_agents_loaded()
         self._agent_params = self._load_agent_params()
         self._active_agent = None
@@ -21,7 +32,7 @@ class AgentHandler:
     def change_model(self, model: str):
         if self._active_agent:
             agent_type = self._active_agent.__class__.__name__.lower().replace('agent', '')
-            self._active_agent = self._create_new_agent(self._active_agent.title, model=model)
+            self._active_agent = self._get_agent(self._active_agent.title, model=model)
 
     @property
     def agent_titles(self) -> list:
@@ -34,7 +45,7 @@ class AgentHandler:
     @active_agent.setter
     def active_agent(self, title: str):
         if title in self._agent_params:
-            self._active_agent = self._create_new_agent(title)
+            self._active_agent = self._get_agent(title)
         else:
             st.error(f"No agent configuration found for: {title}")
 
@@ -43,6 +54,28 @@ class AgentHandler:
             config = yaml.safe_load(file)
         return config
 
+    def _get_agent(self, title: str, model: str = None) -> Optional[BaseAgent]:
+        """
+        Return a pooled agent for (title, model), building and pooling it on a miss.
+        """
+        if title not in self._agent_params:
+            st.error(f"No agent configuration found for: {title}")
+            return None
+
+        key = (title, model if isinstance(model, str) else self._agent_params[title].get('model'))
+        if key in self._agent_pool:
+            self._agent_pool.move_to_end(key)
+            agent = self._agent_pool[key]
+            agent.reset_session_state()
+            return agent
+
+        agent = self._create_new_agent(title, model=model)
+        if agent is not None:
+            self._agent_pool[key] = agent
+            while len(self._agent_pool) > self.pool_size:
+                self._agent_pool.popitem(last=False)
+        return agent
+
     def _create_new_agent(self, title: str, model: str = None) -> Optional[BaseAgent]:
         if title not in self._agent_params:
             st.error(f"No agent configuration found for: {title}")
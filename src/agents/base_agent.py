@@ -4,14 +4,22 @@ from functools import wraps
 from functools import wraps
 from operator import itemgetter
 from collections import OrderedDict
-from copy import deepcopy
+import asyncio
 
 import streamlit as st
 from streamlit.elements.layouts import LayoutsMixin as st_container
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 from langchain_openai import ChatOpenAI
 from langchain_core.runnables import RunnableLambda, RunnablePassthrough
 
 from src.utils.stream_handler import StreamHandler, get_streamhandler_cb
+from src.utils.concurrency import run_coroutine
+from src.utils.rate_limiter import with_session
+from src.utils.history_handler import HistoryWindow
+from src.utils.memory_handler import MemoryOverlay
+from src.agents.llm_registry import LLMRegistry
+from src.utils.response_cache import get_response_cache
+from config import DEFAULT_HISTORY_TOKENS
 from langchain_community.callbacks.streamlit import StreamlitCallbackHandler
 
 
@@ -28,18 +36,32 @@ class BaseAgent(ABC):
     def generate_response(self, query: str):
         pass
 
+    @abstractmethod
+    async def agenerate_response(self, query: str, callbacks: list = None):
+        pass
+
     @abstractmethod
     def _build_llm(self):
         pass
 
+    def reset_session_state(self):
+        """ Called when a pooled agent is reused (see AgentHandler); reset anything the session changed. """
+        pass
+
 # Chainable Agent
 # -----------------
 class ChainableAgent(BaseAgent):
     """ 
     Chainable Agent:
-    - This is a general base class for "agents" that use multiple llm inferences in a linear sequence. The external method
-    is `generate_response` which calls the `_run_chains` method. To implement this class children must add chain instances to 
-    the `chains` attribute. 
+    - This is a general base class for "agents" that use multiple llm inferences. The external method
+    is `generate_response` which calls the `_run_chains` method. To implement this class children must add chain instances to
+    the `chains` attribute.
+    - `agenerate_response` is the asyncio-native equivalent. It awaits `ainvoke` on each chain so network waits
+    yield to the event loop instead of holding a thread.
+    - Chains form a DAG. By default a chain depends on the chain registered before it (a linear sequence).
+    `@register_chain(depends_on=[...])` declares explicit dependencies; chains whose dependencies are met run
+    concurrently, and each chain receives its dependencies' results under their `output_key`. The response is
+    the result of the last registered chain.
     """
     ###########################################################################################
     #################              BASE AGENT METHODS        ##################################
@@ -47,21 +69,51 @@ class ChainableAgent(BaseAgent):
     def __init__(self, title: str, **kwargs):
         self.title = title
         self.chains = OrderedDict()
+        self.chain_dependencies = OrderedDict()
+        self.chain_output_keys = {}
         self.role = kwargs.get('role', 'default role')
+        self._configured_role = self.role
         self.model_provider = kwargs.get('model_provider', 'openai')
         self.model = kwargs.get('model', 'default-model')
-        self.internal_memory = deepcopy(st.session_state.memory_cache)
+        self.history_tokens = kwargs.get('history_tokens', DEFAULT_HISTORY_TOKENS)
+        self.response_cache = kwargs.get('response_cache', False)
+        self.history = HistoryWindow(st.session_state.memory_cache, self.history_tokens, self.model)
+        self.internal_memory = MemoryOverlay(st.session_state.memory_cache)
         self._build_llm()
         self._initialize_chains()
 
     def generate_response(self, query: str):
         return self._run_chains(query)
 
+    async def agenerate_response(self, query: str, callbacks: list = None):
+        """
+        Async version of `generate_response`. Callbacks must be created by the caller on the Streamlit
+        script thread (see `get_streamhandler_cb`) because the coroutine runs on the shared event loop.
+        """
+        return await self._arun_chains(query, callbacks)
+
+    def reset_session_state(self):
+        """
+        Restore the configured role and attach the history to the session's current memory cache,
+        which "Clear Memory Cache" replaces. Chains hold the HistoryWindow and MemoryOverlay
+        objects, so those are re-pointed rather than rebuilt.
+        """
+        self.role = self._configured_role
+        memory_cache = st.session_state.memory_cache
+        self.history.memory_cache = memory_cache
+        self.history.token_cache = []
+        self.internal_memory.parent = memory_cache
+        self.internal_memory.clear()
+
     def _build_llm(self):
-        if self.model_provider == 'openai':
-            self.llm = ChatOpenAI(model=self.model, streaming=True, verbose=False)
-        else:
-            raise NotImplementedError(f"Model provider {self.model_provider} is not supported.")
+        self.llm = LLMRegistry.get_llm(self.model_provider, self.model, **self._llm_params())
+
+    def _llm_params(self) -> dict:
+        """ Shared parameters for every LLM the agent builds. """
+        params = {'streaming': True, 'verbose': False}
+        if self.response_cache:
+            params['cache'] = get_response_cache()
+        return params
         
     ###########################################################################################
     #################          CHAINABLE AGENT METHODS       ##################################
@@ -72,21 +124,73 @@ class ChainableAgent(BaseAgent):
             method = getattr(self, method_name)
             if callable(method) and hasattr(method, '_is_chain'):
                 method()  # Call the chain-building method to build the chain and add it to `self.chains`
-        
+        self._validate_chain_graph()
+
+    def _validate_chain_graph(self):
+        """ Ensure every dependency is a registered chain and the graph has no cycles. """
+        visiting, done = set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Chain dependency cycle detected at '{name}' in {self.__class__.__name__}.")
+            visiting.add(name)
+            for dep in self.chain_dependencies[name]:
+                if dep not in self.chains:
+                    raise ValueError(f"Chain '{name}' depends on unknown chain '{dep}'.")
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.chains:
+            visit(name)
+
     def _run_chains(self, query: str):
-        result = None
         cb = get_streamhandler_cb()
-        for chain_name, chain in self.chains.items():
-            result = chain.invoke({'role': self.role, 'query': query}, {'callbacks': [cb]})
-        return result 
-    
-    def _add_chain(self, name, chain):
+        ctx = get_script_run_ctx()
+        return run_coroutine(with_session(self._arun_chains(query, [cb]), ctx.session_id if ctx else None))
+
+    async def _arun_chains(self, query: str, callbacks: list = None):
+        """
+        Schedule the chain DAG. Every chain becomes a task that awaits its dependencies' tasks, so
+        independent chains overlap their network waits.
+        """
+        config = {'callbacks': callbacks or []}
+        tasks = {}
+
+        async def run_chain(name):
+            deps = self.chain_dependencies[name]
+            dep_results = await asyncio.gather(*(tasks[dep] for dep in deps))
+            inputs = {'role': self.role, 'query': query}
+            inputs.update({self.chain_output_keys[dep]: result for dep, result in zip(deps, dep_results)})
+            return await self.chains[name].ainvoke(inputs, config)
+
+        for name in self.chains:
+            tasks[name] = asyncio.ensure_future(run_chain(name))
+        try:
+            results = await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                task.cancel()
+        return results[-1] if results else None
+
+    def _add_chain(self, name, chain, depends_on=None, output_key=None):
+        if depends_on is None:
+            # Default to a linear sequence: depend on the previously registered chain
+            depends_on = list(self.chains)[-1:]
         self.chains[name] = chain
+        self.chain_dependencies[name] = list(depends_on)
+        self.chain_output_keys[name] = output_key or name
 
     ###########################################################################################
     #################              DEVELOPER METHODS          #################################
     ###########################################################################################
 
+    def load_history(self):
+        """ Runnable that loads the token-budgeted chat history (see HistoryWindow). """
+        return RunnableLambda(self.history.load_memory_variables) | itemgetter('history')
+
     def fetch_memory(self, *args, **kwargs):
         return RunnablePassthrough.assign(history=RunnableLambda(self.internal_memory.load_memory_variables) | itemgetter('history'))
     
@@ -99,11 +203,22 @@ class ChainableAgent(BaseAgent):
         return prompt
     
 
-def register_chain(func):
-    @wraps(func)
-    def wrapper(self, *args, **kwargs):
-        chain = func(self, *args, **kwargs)
-        self._add_chain(func.__name__, chain)
-        return chain
-    wrapper._is_chain = True
-    return wrapper
\ No newline at end of file
+def register_chain(func=None, *, depends_on: list = None, output_key: str = None):
+    """
+    Mark a method as a chain builder. Usable bare (`@register_chain`) or with arguments:
+    - depends_on: names of chains that must finish first. Defaults to the previously registered chain;
+      pass `[]` for a chain that can start immediately.
+    - output_key: input key under which dependent chains receive this chain's result (defaults to the method name).
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self, *args, **kwargs):
+            chain = func(self, *args, **kwargs)
+            self._add_chain(func.__name__, chain, depends_on=depends_on, output_key=output_key)
+            return chain
+        wrapper._is_chain = True
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
\ No newline at end of file
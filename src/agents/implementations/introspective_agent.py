@@ -51,9 +51,11 @@ class IntrospectiveAgent(ChainableAgent):
     def _build_intro_chain(self):
         prompt = SIMPLE_INTROSPECTION_PROMPT
         parser = StrOutputParser()
-        return RunnablePassthrough.assign(history=RunnableLambda(st.session_state.memory_cache.load_memory_variables) | itemgetter('history')) | prompt | self.llm | parser
+        return RunnablePassthrough.assign(history=self.load_history()) | prompt | self.llm | parser
 
-    @register_chain
+    # The main chain must follow the introspection pass: the thought is streamed into the pending AI
+    # message, which the main chain then reads back through the chat history.
+    @register_chain(depends_on=['_build_intro_chain'])
     def _build_main_chain(self):
         prompt = ChatPromptTemplate(messages=[
             SystemMessagePromptTemplate.from_template('{role}'),
@@ -61,4 +63,4 @@ class IntrospectiveAgent(ChainableAgent):
             HumanMessagePromptTemplate.from_template('{query}')
         ])
         parser = StrOutputParser()
-        return RunnablePassthrough.assign(history=RunnableLambda(st.session_state.memory_cache.load_memory_variables) | itemgetter('history')) | prompt | self.llm | parser
+        return RunnablePassthrough.assign(history=self.load_history()) | prompt | self.llm | parser
@@ -1,12 +1,16 @@
-from src.agents.base_agent import ChainableAgent, register_chain
-from langchain_pinecone import PineconeVectorStore
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+from src.agents.base_agent import register_chain
+from src.agents.retrieval_agent import RetrievalAgent
+from langchain_openai import ChatOpenAI
 from langchain_core.prompts.prompt import PromptTemplate
-from langchain_core.runnables import RunnablePassthrough, RunnableLambda
+from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.tools import tool
-from operator import itemgetter
 from src.agents.agent_registry import register_agent
+from src.rag.context import ContextExpander, build_context_assembler
+from src.rag.doc_store import get_doc_store
+from src.rag.retrievers import build_retriever
+from src.rag.vector_store import build_vector_store
+from src.rag.embeddings import get_embeddings
 
 import typer
 
@@ -81,57 +85,54 @@ As a specialist in Isaac Sim and Isaac Lab:
 RAG_PROMPT = PromptTemplate(input_variables=["context", "query"], template=_RAG_PROMPT_TEMPLATE)
 
 @register_agent
-class IsaacSimAgent(ChainableAgent):
+class IsaacSimAgent(RetrievalAgent):
     def __init__(self, title, **kwargs):
-        self.embeddings = OpenAIEmbeddings()
-        self.vector_store = PineconeVectorStore(index_name='omniverse-index', embedding=self.embeddings)
-        self.retriever = self.vector_store.as_retriever(search_kwargs={"k": 3})
-        super().__init__(title, **kwargs)
-
-    def get_full_doc_context(self, source):
-        metadata_filter = {"source": {"$eq": source}}
-        results = self.vector_store.similarity_search(
-            query="",
-            k=500,
-            filter=metadata_filter
+        self.index_name = 'omniverse-index'
+        self.embeddings = get_embeddings()
+        self.vector_store = build_vector_store(self.index_name, self.embeddings, kwargs.get('vector_store'))
+        self.retriever = build_retriever(self.index_name, self.vector_store, kwargs.get('retriever'))
+        self.doc_store = get_doc_store(self.index_name)
+        self.fetch_timeout = kwargs.get('fetch_timeout', 10.0)
+        context = dict(kwargs.get('context', {}))
+        self.context_assembler = build_context_assembler(self.embeddings, context, kwargs.get('model'))
+        context.pop('mmr', None)
+        self.context_expander = ContextExpander(
+            self.doc_store, self.vector_store, model=kwargs.get('model'), fetch_timeout=self.fetch_timeout,
+            indexes=getattr(self.retriever, 'vector_stores', None), **context,
         )
-        sorted_results = sorted(results, key=lambda doc: float(doc.metadata.get('chunk_id', 0)))
-        doc_context = ''.join(doc.page_content for doc in sorted_results)
-
-        return doc_context
+        super().__init__(title, **kwargs)
 
-    @register_chain
-    def rag_chain(self):  
+    @register_chain(depends_on=[], output_key='context')
+    def retrieval_chain(self):
         @tool
         def get_context_tool(query: str):
             """
             Get the context of a query from the vector store
             """
-            chunks = self.retriever.invoke(query)
+            # Diverse hits (MMR), expanded to neighbouring chunks or whole documents within the token budget
+            chunks = self.context_assembler.rerank(query, self.retriever.invoke(query))
             context = ""
-            doc_list = []
 
-            for chunk in chunks:
-                source = chunk.metadata['source']
-                file_name = chunk.metadata['file_name']
-
-                if source not in doc_list:
-                    doc_list.append(source)
-                    doc_context = self.get_full_doc_context(source)
-                    
-                    context += f"## Document {len(doc_list)}\n"
-                    context += f"### File Name: {file_name}\n"
-                    context += f"### Content:\n{doc_context}\n\n"
+            for idx, (chunk, doc_context) in enumerate(self.context_expander.expand(chunks), start=1):
+                context += f"## Document {idx}\n"
+                context += f"### File Name: {chunk.metadata['file_name']}\n"
+                context += f"### Content:\n{doc_context}\n\n"
 
             return context
 
+        return get_context_tool
+
+    @register_chain(depends_on=[], output_key='history')
+    def history_chain(self):
+        return self.load_history()
+
+    @register_chain(depends_on=['retrieval_chain', 'history_chain'])
+    def rag_chain(self):  
+        # Retrieval and history loading run concurrently; their results arrive as `context` and `history`
         rag_chain = (
-            RunnablePassthrough.assign(context=get_context_tool)
-            | RunnablePassthrough.assign(history=RunnableLambda(st.session_state.memory_cache.load_memory_variables) | itemgetter('history'))
-            | RAG_PROMPT
+            RAG_PROMPT
             | self.llm
             | StrOutputParser()
         )
 
         return rag_chain
-
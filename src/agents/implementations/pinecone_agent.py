@@ -1,12 +1,15 @@
-from src.agents.base_agent import ChainableAgent, register_chain
-from langchain_pinecone import PineconeVectorStore
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+from src.agents.base_agent import register_chain
+from src.agents.retrieval_agent import RetrievalAgent
+from langchain_openai import ChatOpenAI
 from langchain_core.prompts.prompt import PromptTemplate
-from langchain_core.runnables import RunnablePassthrough, RunnableLambda
+from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.tools import tool
-from operator import itemgetter
 from src.agents.agent_registry import register_agent
+from src.rag.context import build_context_assembler
+from src.rag.retrievers import build_retriever
+from src.rag.vector_store import build_vector_store
+from src.rag.embeddings import get_embeddings
 
 import typer
 
@@ -76,22 +79,25 @@ anticipating further queries from the user.
 RAG_PROMPT = PromptTemplate(input_variables=["context", "query"], template=_RAG_PROMPT_TEMPLATE)
 
 @register_agent
-class PineconeAgent(ChainableAgent):
+class PineconeAgent(RetrievalAgent):
     def __init__(self, title, **kwargs):
-        self.embeddings = OpenAIEmbeddings()
-        self.vector_store = PineconeVectorStore(index_name='vector-vault-1', embedding=self.embeddings)
-        self.retriever = self.vector_store.as_retriever(search_kwargs={"k": 3})
+        self.index_name = 'vector-vault-1'
+        self.embeddings = get_embeddings()
+        self.vector_store = build_vector_store(self.index_name, self.embeddings, kwargs.get('vector_store'))
+        self.retriever = build_retriever(self.index_name, self.vector_store, kwargs.get('retriever'))
+        self.context_assembler = build_context_assembler(self.embeddings, kwargs.get('context'), kwargs.get('model'))
         super().__init__(title, **kwargs)
 
-    @register_chain
-    def rag_chain(self):  
+    @register_chain(depends_on=[], output_key='context')
+    def retrieval_chain(self):
         # @tool_handler
         @tool
         def get_context_tool(query: str):
             """
             Get the context of a query from the vector store
             """
-            docs = self.retriever.invoke(query)
+            # Reranked for diversity (MMR) and packed into the agent's token budget
+            docs = self.context_assembler.assemble(query, self.retriever.invoke(query))
             context = ""
             for i, doc in enumerate(docs):
                 context += f"## Document {i+1}\n"
@@ -101,13 +107,19 @@ class PineconeAgent(ChainableAgent):
 
             return context
 
+        return get_context_tool
+
+    @register_chain(depends_on=[], output_key='history')
+    def history_chain(self):
+        return self.load_history()
+
+    @register_chain(depends_on=['retrieval_chain', 'history_chain'])
+    def rag_chain(self):  
+        # Retrieval and history loading run concurrently; their results arrive as `context` and `history`
         rag_chain = (
-            RunnablePassthrough.assign(context=get_context_tool)
-            | RunnablePassthrough.assign(history=RunnableLambda(st.session_state.memory_cache.load_memory_variables) | itemgetter('history'))
-            | RAG_PROMPT
+            RAG_PROMPT
             | self.llm
             | StrOutputParser()
         )
 
         return rag_chain
-
@@ -7,6 +7,7 @@ import streamlit as st
 from langchain_openai import ChatOpenAI
 from src.agents.base_agent import ChainableAgent, register_chain
 from src.agents.agent_registry import register_agent
+from src.agents.llm_registry import LLMRegistry
 from langchain_core.prompts.prompt import PromptTemplate
 
 _ROLE_INTROSPECTION_PROMPT_TEMPLATE = """
@@ -107,11 +108,11 @@ class RoleAgent(ChainableAgent):
             self.role = result
             return result
 
-        role_llm = ChatOpenAI(model='gpt-4-0613', streaming=True, verbose=False)
+        role_llm = LLMRegistry.get_llm('openai', 'gpt-4-0613', **self._llm_params())
 
         return (
             RunnablePassthrough.assign(
-                history=RunnableLambda(st.session_state.memory_cache.load_memory_variables) | itemgetter('history')
+                history=self.load_history()
             ) 
             | prompt 
             | role_llm
@@ -129,7 +130,7 @@ class RoleAgent(ChainableAgent):
         parser = StrOutputParser()
         return (
             RunnablePassthrough.assign(
-                history=RunnableLambda(st.session_state.memory_cache.load_memory_variables) | itemgetter('history')
+                history=self.load_history()
             ) 
             | prompt 
             | self.llm 
@@ -22,5 +22,5 @@ class SimpleAgent(ChainableAgent):
         ])
         parser = StrOutputParser()
         return RunnablePassthrough.assign(
-            history=RunnableLambda(st.session_state.memory_cache.load_memory_variables) | itemgetter('history')
+            history=self.load_history()
         ) | prompt | self.llm | parser
@@ -0,0 +1,157 @@
+# llm_registry.py
+import copy
+import hashlib
+import json
+import threading
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.load import dumpd
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_openai import ChatOpenAI
+
+from config import HTTP_POOL_LIMITS, HTTP_TIMEOUT
+from src.utils.rate_limiter import get_admission_controller, session_id
+from src.utils.single_flight import single_flight
+from src.utils.tokens import count_tokens
+
+class SingleFlightChatOpenAI(ChatOpenAI):
+    """
+    ChatOpenAI that shares one upstream stream between identical concurrent requests.
+
+    Requests are fingerprinted by model parameters, messages and stop sequences. While a request is
+    streaming, an identical one subscribes to it instead of calling the API: it replays the chunks
+    received so far and then follows the live stream. Every subscriber gets its own copy of each
+    chunk, so per-run callbacks (token streaming to each session's UI) are unaffected.
+
+    Every call that reaches the API first passes the model's process-wide admission controller
+    (concurrency, RPM / TPM buckets, fair queuing across sessions; see src/utils/rate_limiter.py).
+    """
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        if self.streaming:
+            return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        controller, prompt_tokens, completion_tokens = self._admission(messages, kwargs)
+        estimated = prompt_tokens + completion_tokens
+        controller.acquire(estimated)
+        result = None
+        try:
+            result = super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            return result
+        finally:
+            controller.release(estimated, self._total_tokens(result))
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        if self.streaming:
+            return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        controller, prompt_tokens, completion_tokens = self._admission(messages, kwargs)
+        estimated = prompt_tokens + completion_tokens
+        await controller.aacquire(estimated)
+        result = None
+        try:
+            result = await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            return result
+        finally:
+            controller.release(estimated, self._total_tokens(result))
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        upstream = super()._stream
+        controller, prompt_tokens, completion_tokens = self._admission(messages, kwargs)
+        # The stream is pumped on another thread, so the session is read here
+        session = session_id.get()
+        limited = lambda: controller.limit_stream(lambda: upstream(messages, stop=stop, **kwargs), prompt_tokens,
+                                                  completion_tokens, self._count_chunk, session)
+        for chunk in single_flight.stream(self._fingerprint(messages, stop, kwargs), limited):
+            chunk = copy.deepcopy(chunk)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        upstream = super()._astream
+        controller, prompt_tokens, completion_tokens = self._admission(messages, kwargs)
+        session = session_id.get()
+        limited = lambda: controller.alimit_stream(lambda: upstream(messages, stop=stop, **kwargs), prompt_tokens,
+                                                   completion_tokens, self._count_chunk, session)
+        async for chunk in single_flight.astream(self._fingerprint(messages, stop, kwargs), limited):
+            chunk = copy.deepcopy(chunk)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    def _admission(self, messages: List[BaseMessage], kwargs: dict) -> tuple:
+        """ Return the model's admission controller and the (prompt, completion) token estimate of a call. """
+        controller = get_admission_controller(self.model_name)
+        # ~4 tokens of chat formatting per message, 3 to prime the reply
+        prompt_tokens = sum(count_tokens(str(message.content), self.model_name) + 4 for message in messages) + 3
+        completion_tokens = kwargs.get('max_tokens') or self.max_tokens or controller.completion_tokens
+        return controller, prompt_tokens, completion_tokens
+
+    def _count_chunk(self, chunk: ChatGenerationChunk) -> int:
+        return count_tokens(chunk.text, self.model_name) if chunk.text else 0
+
+    @staticmethod
+    def _total_tokens(result: Optional[ChatResult]) -> Optional[int]:
+        usage = ((result.llm_output or {}).get('token_usage') or {}) if result is not None else {}
+        return usage.get('total_tokens')
+
+    def _fingerprint(self, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: dict) -> tuple:
+        payload = json.dumps(
+            [self._get_invocation_params(stop=stop, **kwargs), [dumpd(message) for message in messages]],
+            sort_keys=True, default=str,
+        )
+        return ('chat', hashlib.sha256(payload.encode('utf-8')).hexdigest())
+
+class LLMRegistry:
+    """
+    Process-wide registry of chat model clients.
+
+    Clients are keyed by (provider, model, params) and shared by every agent in every session.
+    All OpenAI clients use one sync and one async httpx client, so connections (and TLS sessions)
+    are pooled with keep-alive across the whole process. Pool limits come from `config.py`.
+    OpenAI models are SingleFlightChatOpenAI, so identical concurrent requests share one stream and
+    every call is admitted through the per-model rate limiter.
+    """
+    _llms: Dict[Tuple, BaseChatModel] = {}
+    _http_client: httpx.Client = None
+    _http_async_client: httpx.AsyncClient = None
+    # Reentrant: get_llm builds clients under the lock, and building one fetches the shared HTTP clients
+    _lock = threading.RLock()
+
+    @classmethod
+    def get_llm(cls, provider: str, model: str, **params) -> BaseChatModel:
+        key = (provider, model, tuple(sorted(params.items())))
+        llm = cls._llms.get(key)
+        if llm is None:
+            with cls._lock:
+                llm = cls._llms.get(key)
+                if llm is None:
+                    llm = cls._build_llm(provider, model, **params)
+                    cls._llms[key] = llm
+        return llm
+
+    @classmethod
+    def get_http_clients(cls) -> Tuple[httpx.Client, httpx.AsyncClient]:
+        """ Return the shared (sync, async) httpx clients, creating them on first use. """
+        if cls._http_client is None:
+            with cls._lock:
+                if cls._http_client is None:
+                    limits = httpx.Limits(**HTTP_POOL_LIMITS)
+                    cls._http_async_client = httpx.AsyncClient(limits=limits, timeout=HTTP_TIMEOUT)
+                    cls._http_client = httpx.Client(limits=limits, timeout=HTTP_TIMEOUT)
+        return cls._http_client, cls._http_async_client
+
+    @classmethod
+    def _build_llm(cls, provider: str, model: str, **params) -> BaseChatModel:
+        if provider == 'openai':
+            http_client, http_async_client = cls.get_http_clients()
+            return SingleFlightChatOpenAI(model=model, http_client=http_client, http_async_client=http_async_client,
+                                          **params)
+        raise NotImplementedError(f"Model provider {provider} is not supported.")
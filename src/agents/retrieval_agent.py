@@ -0,0 +1,64 @@
+# retrieval_agent.py
+import asyncio
+import hashlib
+import json
+
+from src.agents.base_agent import ChainableAgent
+from src.rag.semantic_cache import get_semantic_cache
+from src.utils.stream_handler import areplay_response
+
+class RetrievalAgent(ChainableAgent):
+    """
+    Retrieval Agent:
+    - Base class for agents that answer from a vector index. Children set `self.index_name` and
+    `self.embeddings` before calling `super().__init__`.
+    - Optional semantic answer cache, configured per agent in `config/agents.yaml`:
+
+        semantic_cache:
+          threshold: 0.95     # minimum cosine similarity between queries
+          history_turns: 1    # recent exchanges that must match for an answer to be reused
+
+    A hit replays the stored answer through the callbacks and skips retrieval and generation.
+    """
+    def __init__(self, title: str, **kwargs):
+        self.semantic_cache_params = kwargs.get('semantic_cache')
+        self.semantic_cache = get_semantic_cache() if self.semantic_cache_params else None
+        super().__init__(title, **kwargs)
+
+    async def _arun_chains(self, query: str, callbacks: list = None):
+        if self.semantic_cache is None:
+            return await super()._arun_chains(query, callbacks)
+
+        scope = await asyncio.to_thread(self._semantic_cache_scope, query)
+        threshold = self.semantic_cache_params.get('threshold', 0.95)
+        embedding = await self.embeddings.aembed_query(query)
+        answer = await asyncio.to_thread(self.semantic_cache.lookup, embedding, scope, self.index_name, threshold)
+        if answer is not None:
+            await areplay_response(answer, callbacks, name='semantic_cache')
+            return answer
+
+        answer = await super()._arun_chains(query, callbacks)
+        await asyncio.to_thread(self.semantic_cache.update, query, embedding, answer, scope, self.index_name)
+        return answer
+
+    def _semantic_cache_scope(self, query: str) -> str:
+        """
+        Hash of the agent, the current version of every index its answers draw on (the members of a
+        federated retriever included) and the last `history_turns` exchanges before the current query.
+        Re-ingesting any of those indexes therefore moves the agent to a fresh scope.
+        """
+        messages = list(self.history.memory_cache.chat_memory.messages)
+        # Drop the current turn: the pending (empty) AI message and the query itself
+        if messages and messages[-1].type == 'ai' and not messages[-1].content:
+            messages.pop()
+        if messages and messages[-1].type == 'human' and messages[-1].content == query:
+            messages.pop()
+        turns = self.semantic_cache_params.get('history_turns', 1)
+        recent = messages[-2 * turns:] if turns > 0 else []
+        versions = [[name, self.semantic_cache.index_version(name)] for name in self._semantic_cache_indexes()]
+        payload = json.dumps([self.title, self.index_name, versions, [[m.type, str(m.content)] for m in recent]])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _semantic_cache_indexes(self) -> list:
+        members = getattr(getattr(self, 'retriever', None), 'vector_stores', None) or {}
+        return sorted({self.index_name, *members})
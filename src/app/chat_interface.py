@@ -1,5 +1,9 @@
 import streamlit as st
 from src.app.ui_component import display_last_message
+from src.utils.stream_handler import get_streamhandler_cb
+from src.utils.concurrency import run_coroutine
+from src.utils.rate_limiter import with_session
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import os
 from config import APP_MODE
 import typer
@@ -27,12 +31,19 @@ def handle_query(query, body):
 def handle_response(query, body):
     """
     Generate a response using the active agent and display it.
+
+    The agent runs on the shared event loop. The stream handler is created here, on the script
+    thread, so its containers belong to this session's chat message. The coroutine carries the
+    session id so its LLM calls are queued fairly against other sessions'.
     """
     agent = st.session_state.agent_handler.active_agent
     st.session_state.memory_handler.add_ai_message('', {})
     with body:
         with st.chat_message('assistant'):
-            response = agent.generate_response(query)
+            cb = get_streamhandler_cb()
+            ctx = get_script_run_ctx()
+            response = run_coroutine(with_session(agent.agenerate_response(query, callbacks=[cb]),
+                                                  ctx.session_id if ctx else None))
 
     return response
 
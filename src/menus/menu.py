@@ -1,5 +1,6 @@
 import streamlit as st
 from langchain.memory import ConversationBufferMemory
+from src.utils.memory_handler import MemoryHandler
 
 # Local imports
 from config import APP_MODE
@@ -105,6 +106,9 @@ class SimpleMenuMethods:
     def clear_memory_cache(menu_status, **kwargs):
         """ Clear the memory cache. Include auto-save feature to backup to pinecone. """
         st.session_state.memory_cache = ConversationBufferMemory(return_messages=True)
+        st.session_state.memory_handler = MemoryHandler(st.session_state.memory_cache)
+        # Pooled agents re-attach to the new memory when reused; the active one does it now
+        st.session_state.agent_handler.active_agent.reset_session_state()
         menu_status.success("Memory cache cleared.")
 
     @staticmethod
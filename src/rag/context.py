@@ -0,0 +1,241 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from src.rag.doc_store import DocStore, get_doc_store
+from src.rag.vector_store import ID_SEPARATOR
+from src.utils.concurrency import thread_map
+from src.utils.tokens import count_tokens
+
+# Marks a gap between non-adjacent windows of the same document
+WINDOW_SEPARATOR = '\n...\n'
+
+class ContextAssembler:
+    """
+    Reranks retrieved chunks for the prompt and packs them into a token budget.
+
+    - `rerank`: maximal marginal relevance over the chunk embeddings. Each step picks the chunk
+      maximizing `lambda_mult * sim(query, chunk) - (1 - lambda_mult) * max sim(chunk, picked)`, using one
+      similarity matrix for all candidates. Chunks at least `duplicate_threshold` similar to a picked
+      chunk are dropped as near-duplicates. At most `top_k` chunks are kept.
+    - `pack`: keeps chunks in reranked order while they fit in `max_tokens`.
+
+    Embeddings go through the shared embedding cache, where ingested chunks already are, so
+    reranking normally costs no embedding requests.
+    """
+    def __init__(self, embeddings: Embeddings, max_tokens: int = 3000, model: str = None, lambda_mult: float = 0.5,
+                 duplicate_threshold: float = 0.95, top_k: Optional[int] = None):
+        self.embeddings = embeddings
+        self.max_tokens = max_tokens
+        self.model = model
+        self.lambda_mult = lambda_mult
+        self.duplicate_threshold = duplicate_threshold
+        self.top_k = top_k
+
+    def assemble(self, query: str, docs: List[Document]) -> List[Document]:
+        return self.pack(self.rerank(query, docs))
+
+    def rerank(self, query: str, docs: List[Document]) -> List[Document]:
+        top_k = min(self.top_k or len(docs), len(docs))
+        if len(docs) <= 1:
+            return docs[:top_k]
+        vectors = _normalize(np.asarray(self.embeddings.embed_documents([doc.page_content for doc in docs]), dtype=np.float32))
+        query_sim = vectors @ _normalize(np.asarray(self.embeddings.embed_query(query), dtype=np.float32))
+        pairwise = vectors @ vectors.T
+
+        picked = []
+        redundancy = np.full(len(docs), -np.inf, dtype=np.float32)
+        available = np.ones(len(docs), dtype=bool)
+        while len(picked) < top_k and available.any():
+            penalty = np.where(np.isfinite(redundancy), redundancy, 0.0)
+            scores = self.lambda_mult * query_sim - (1 - self.lambda_mult) * penalty
+            best = int(np.argmax(np.where(available, scores, -np.inf)))
+            picked.append(best)
+            redundancy = np.maximum(redundancy, pairwise[best])
+            available[best] = False
+            available &= redundancy < self.duplicate_threshold
+        return [docs[idx] for idx in picked]
+
+    def pack(self, docs: List[Document]) -> List[Document]:
+        """ Keep chunks in order while they fit; the first chunk is always kept. """
+        packed, budget = [], self.max_tokens
+        for doc in docs:
+            tokens = count_tokens(doc.page_content, self.model)
+            if packed and tokens > budget:
+                continue
+            packed.append(doc)
+            budget -= tokens
+        return packed
+
+class ContextExpander:
+    """
+    Turns retrieved chunks into prompt context under a token budget ("small-to-big" retrieval).
+
+    - `window` mode: every hit is expanded to its neighbours `chunk_id - window .. chunk_id + window`.
+      Overlapping or adjacent windows of a document are merged, so each chunk appears once.
+    - `full` mode: hits are expanded to their whole document. A document that does not fit in the
+      remaining budget is expanded by window instead.
+
+    Whole documents are packed in rank order; windows are then filled until `max_tokens` is spent,
+    hits first and then neighbours by distance, so every document keeps its hits before any window
+    grows. A window only grows outward from its hits, so a trimmed window stays contiguous.
+
+    Neighbours are read from the doc store, falling back to the vector store for sources it does not
+    hold; each document gets `fetch_timeout` seconds, after which only its hits are used. Hits tagged
+    with an `index_name` found in `indexes` (federated retrieval) are read from that index and its
+    doc store instead.
+    """
+    def __init__(self, doc_store: DocStore, vector_store, mode: str = 'window', window: int = 2,
+                 max_tokens: int = 6000, model: str = None, fetch_timeout: float = 10.0,
+                 indexes: Optional[Dict[str, object]] = None):
+        if mode not in ('window', 'full'):
+            raise ValueError(f"Unsupported context mode: {mode}")
+        self.doc_store = doc_store
+        self.vector_store = vector_store
+        self.mode = mode
+        self.window = window
+        self.max_tokens = max_tokens
+        self.model = model
+        self.fetch_timeout = fetch_timeout
+        self.indexes = indexes or {}
+
+    def expand(self, hits: List[Document]) -> List[Tuple[Document, str]]:
+        """ Return (top-ranked hit, context text) per document, in rank order. """
+        by_source: Dict[Tuple[Optional[str], str], List[Document]] = {}
+        for hit in hits:
+            by_source.setdefault((hit.metadata.get('index_name'), hit.metadata['source']), []).append(hit)
+
+        fetched = thread_map(lambda source: self._fetch(source, by_source[source]), by_source,
+                             timeout=self.fetch_timeout)
+
+        full_texts, windowed, budget = {}, {}, self.max_tokens
+        for (source, source_hits), neighbours in zip(by_source.items(), fetched):
+            full_text, chunks = neighbours if neighbours is not None else (None, [])
+            if full_text is not None:
+                tokens = count_tokens(full_text, self.model)
+                if tokens <= budget:
+                    full_texts[source] = full_text
+                    budget -= tokens
+                    continue
+            windowed[source] = (source_hits, chunks)
+        packed = self._pack(windowed, budget)
+
+        sections = []
+        for source, source_hits in by_source.items():
+            text = full_texts.get(source, packed.get(source))
+            if text:
+                sections.append((source_hits[0], text))
+        return sections
+
+    ###########################################################################################
+    #################                    FETCHING              ################################
+    ###########################################################################################
+    def _fetch(self, key: Tuple[Optional[str], str], hits: List[Document]) -> Tuple[Optional[str], List[Document]]:
+        """ (full text or None, neighbouring chunks) of one document. """
+        index_name, source = key
+        if index_name in self.indexes:
+            doc_store, vector_store = get_doc_store(index_name), self.indexes[index_name]
+        else:
+            doc_store, vector_store = self.doc_store, self.vector_store
+        full_text = None
+        if self.mode == 'full':
+            full_text = doc_store.get_document(source)
+            if full_text is None:
+                full_text = ''.join(doc.page_content for doc in vector_store.fetch_source(source))
+        chunks = []
+        for start, end in self._windows(hits):
+            chunks.extend(self._fetch_range(doc_store, vector_store, source, start, end))
+        return full_text, chunks
+
+    @staticmethod
+    def _fetch_range(doc_store: DocStore, vector_store, source: str, start: float, end: float) -> List[Document]:
+        chunks = doc_store.get_chunks(source, start, end)
+        if chunks:
+            return chunks
+        ids = [f'{source}{ID_SEPARATOR}{chunk_id}' for chunk_id in range(int(start), int(end) + 1)]
+        chunks = vector_store.fetch_by_ids(ids)
+        if not chunks:
+            chunks = vector_store.fetch_by_metadata({'$and': [
+                {'source': {'$eq': source}}, {'chunk_id': {'$gte': start}}, {'chunk_id': {'$lte': end}},
+            ]})
+        return chunks
+
+    def _windows(self, hits: List[Document]) -> List[Tuple[float, float]]:
+        """ Merged `chunk_id ± window` ranges around the hits, in chunk order. """
+        windows = []
+        for chunk_id in sorted(_chunk_id(hit) for hit in hits):
+            start, end = max(0.0, chunk_id - self.window), chunk_id + self.window
+            if windows and start <= windows[-1][1] + 1:
+                windows[-1] = (windows[-1][0], max(windows[-1][1], end))
+            else:
+                windows.append((start, end))
+        return windows
+
+    ###########################################################################################
+    #################                     PACKING              ################################
+    ###########################################################################################
+    def _pack(self, windowed: Dict[tuple, Tuple[List[Document], List[Document]]], budget: int) -> Dict[tuple, str]:
+        """
+        Greedily keep the chunks nearest a hit, across all documents, while they fit in `budget`: every
+        hit before any neighbour, then neighbours by distance and document rank. A chunk is only
+        eligible once the chunk between it and its nearest hit is kept. The top hit is always kept.
+        Returns the text per document.
+        """
+        candidates, kept = [], {}
+        for rank, (source, (hits, chunks)) in enumerate(windowed.items()):
+            by_id = {_chunk_id(chunk): chunk for chunk in chunks}
+            for hit in hits:
+                by_id.setdefault(_chunk_id(hit), hit)
+            hit_ids = [_chunk_id(hit) for hit in hits]
+            for chunk_id, chunk in by_id.items():
+                hit_id = min(hit_ids, key=lambda hit_id: abs(hit_id - chunk_id))
+                candidates.append((abs(hit_id - chunk_id), rank, chunk_id, hit_id, source, chunk))
+            kept[source] = {}
+
+        for distance, rank, chunk_id, hit_id, source, chunk in sorted(candidates, key=lambda c: c[:3]):
+            inner = chunk_id - 1 if chunk_id > hit_id else chunk_id + 1
+            if distance and inner not in kept[source]:
+                continue
+            tokens = count_tokens(chunk.page_content, self.model)
+            if tokens > budget and any(kept.values()):
+                continue
+            kept[source][chunk_id] = chunk.page_content
+            budget -= tokens
+
+        texts = {}
+        for source, chunks in kept.items():
+            parts, previous = [], None
+            for chunk_id in sorted(chunks):
+                if previous is not None and chunk_id != previous + 1:
+                    parts.append(WINDOW_SEPARATOR)
+                parts.append(chunks[chunk_id])
+                previous = chunk_id
+            texts[source] = ''.join(parts)
+        return texts
+
+def build_context_assembler(embeddings: Embeddings, config: Optional[dict] = None,
+                            model: str = None) -> ContextAssembler:
+    """
+    Build an agent's ContextAssembler from its `context` block in `config/agents.yaml`:
+
+        context:
+          max_tokens: 3000  # token budget of the packed context
+          mmr:              # diversify the retrieved chunks
+            lambda_mult: 0.5
+            duplicate_threshold: 0.95
+            top_k: 3
+
+    Agents that expand their hits (see ContextExpander) read `mode`, `window` and `max_tokens` from the
+    same block and only rerank with the assembler.
+    """
+    config = config or {}
+    return ContextAssembler(embeddings, max_tokens=config.get('max_tokens', 3000), model=model, **config.get('mmr', {}))
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+def _chunk_id(chunk: Document) -> float:
+    return float(chunk.metadata.get('chunk_id', 0))
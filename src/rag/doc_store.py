@@ -0,0 +1,132 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from langchain_core.documents import Document
+
+from config import DOC_STORE_DIR
+
+class DocStore:
+    """
+    Local store of the chunks behind a vector index, keyed by `source`.
+
+    Chunks are kept in order of their `chunk_id` metadata (the same ordering IsaacSimAgent uses) and
+    each source's reassembled text is stored alongside them, so a full document is a single
+    primary-key lookup. The store is filled at ingest time; the vector index is only needed for
+    the top-k search.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS chunks ('
+            'source TEXT NOT NULL, chunk_id REAL NOT NULL, text TEXT NOT NULL, metadata TEXT NOT NULL, '
+            'PRIMARY KEY (source, chunk_id))'
+        )
+        self._conn.execute('CREATE TABLE IF NOT EXISTS documents (source TEXT PRIMARY KEY, text TEXT NOT NULL)')
+        self._conn.commit()
+
+    def add_documents(self, docs: Iterable[Document], rebuild: bool = True):
+        """
+        Insert or replace chunks. Chunks without a `chunk_id` are numbered in arrival order per source.
+        Pass `rebuild=False` when loading a source in several batches and call `rebuild_documents` once
+        at the end.
+        """
+        rows = []
+        next_ids: Dict[str, float] = {}
+        for doc in docs:
+            source = doc.metadata['source']
+            chunk_id = doc.metadata.get('chunk_id')
+            if chunk_id is None:
+                chunk_id = next_ids.get(source, 0)
+            next_ids[source] = float(chunk_id) + 1
+            rows.append((source, float(chunk_id), doc.page_content, _dump_metadata(doc.metadata)))
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO chunks (source, chunk_id, text, metadata) VALUES (?, ?, ?, ?)', rows
+            )
+            if rebuild:
+                for source in {row[0] for row in rows}:
+                    self._rebuild_document(source)
+            self._conn.commit()
+
+    def rebuild_documents(self, sources: Iterable[str]):
+        """ Reassemble the stored text of each source from its chunks. """
+        with self._lock:
+            for source in set(sources):
+                self._rebuild_document(source)
+            self._conn.commit()
+
+    def replace_source(self, source: str, docs: Iterable[Document]):
+        """ Replace every chunk of `source` with `docs`. """
+        self.delete_source(source)
+        self.add_documents(docs)
+
+    def delete_source(self, source: str):
+        with self._lock:
+            self._conn.execute('DELETE FROM chunks WHERE source = ?', (source,))
+            self._conn.execute('DELETE FROM documents WHERE source = ?', (source,))
+            self._conn.commit()
+
+    def delete_chunks(self, source: str, chunk_ids: Iterable[float]):
+        """ Delete individual chunks of `source`. Call `rebuild_documents` afterwards. """
+        with self._lock:
+            self._conn.executemany(
+                'DELETE FROM chunks WHERE source = ? AND chunk_id = ?',
+                [(source, float(chunk_id)) for chunk_id in chunk_ids],
+            )
+            self._conn.commit()
+
+    def get_document(self, source: str) -> Optional[str]:
+        """ Return the reassembled text of `source`, or None if the source is not in the store. """
+        with self._lock:
+            row = self._conn.execute('SELECT text FROM documents WHERE source = ?', (source,)).fetchone()
+        return row[0] if row else None
+
+    def get_chunks(self, source: str, start: float = None, end: float = None) -> List[Document]:
+        """ Return the chunks of `source` with `start <= chunk_id <= end`, in order. """
+        query = 'SELECT chunk_id, text, metadata FROM chunks WHERE source = ?'
+        params = [source]
+        if start is not None:
+            query += ' AND chunk_id >= ?'
+            params.append(start)
+        if end is not None:
+            query += ' AND chunk_id <= ?'
+            params.append(end)
+        query += ' ORDER BY chunk_id'
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [Document(page_content=text, metadata=_load_metadata(metadata)) for _, text, metadata in rows]
+
+    def has_source(self, source: str) -> bool:
+        with self._lock:
+            return self._conn.execute('SELECT 1 FROM documents WHERE source = ?', (source,)).fetchone() is not None
+
+    def _rebuild_document(self, source: str):
+        rows = self._conn.execute('SELECT text FROM chunks WHERE source = ? ORDER BY chunk_id', (source,)).fetchall()
+        self._conn.execute(
+            'INSERT OR REPLACE INTO documents (source, text) VALUES (?, ?)', (source, ''.join(row[0] for row in rows))
+        )
+
+def _dump_metadata(metadata: dict) -> str:
+    return json.dumps(metadata, default=str)
+
+def _load_metadata(metadata: str) -> dict:
+    return json.loads(metadata)
+
+_doc_stores: Dict[str, DocStore] = {}
+_doc_stores_lock = threading.Lock()
+
+def get_doc_store(index_name: str) -> DocStore:
+    """ Return the process-wide DocStore for an index, stored under DOC_STORE_DIR. """
+    with _doc_stores_lock:
+        if index_name not in _doc_stores:
+            _doc_stores[index_name] = DocStore(os.path.join(DOC_STORE_DIR, f'{index_name}.sqlite'))
+    return _doc_stores[index_name]
@@ -0,0 +1,253 @@
+import asyncio
+import hashlib
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+from config import EMBEDDINGS
+from src.agents.llm_registry import LLMRegistry
+from src.utils.single_flight import single_flight
+
+class EmbeddingBatcher:
+    """
+    Micro-batches embedding requests from every session into shared provider calls.
+
+    Callers enqueue texts and get futures. A collector thread takes the first pending text, keeps
+    collecting for up to `max_wait` seconds or until `max_batch` texts are queued, and hands the batch
+    to `embed_fn` on its own pool of `max_workers` threads while it collects the next one. Duplicate
+    texts in a batch are embedded once. Callers wait at most `timeout` seconds for their batch.
+
+    The pool is private because callers block on their batch: callers running on the shared I/O
+    pool (thread_map fan-outs) would otherwise starve the batches they wait for.
+    """
+    def __init__(self, embed_fn: Callable[[List[str]], List[List[float]]], max_batch: int = 64,
+                 max_wait: float = 0.005, max_workers: int = 4, timeout: Optional[float] = None):
+        self.embed_fn = embed_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='embedding-batch')
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._collect, name='embedding-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: List[str]) -> List[Future]:
+        futures = []
+        for text in texts:
+            future = Future()
+            self._queue.put((text, future))
+            futures.append(future)
+        return futures
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        futures = self.submit(texts)
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        try:
+            return [future.result(timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+                    for future in futures]
+        except TimeoutError:
+            # Texts that are still queued are skipped by `_flush`
+            for future in futures:
+                future.cancel()
+            raise
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        futures = [asyncio.wrap_future(future) for future in self.submit(texts)]
+        try:
+            _, pending = await asyncio.wait(futures, timeout=self.timeout)
+        finally:
+            # On timeout or cancellation; cancelling a wrapper cancels its queued text
+            for future in futures:
+                future.cancel()
+        if pending:
+            raise TimeoutError(f'Embedding batch not done within {self.timeout}s')
+        # Read every exception so failed texts of a shared batch are not reported as never retrieved
+        errors = [error for error in (future.exception() for future in futures) if error is not None]
+        if errors:
+            raise errors[0]
+        return [future.result() for future in futures]
+
+    def _collect(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._executor.submit(self._flush, batch)
+
+    def _flush(self, batch: List[tuple]):
+        waiters: Dict[str, List[Future]] = {}
+        for text, future in batch:
+            # Callers that timed out or were cancelled have cancelled their future; the rest can no
+            # longer be cancelled, so resolving them below cannot fail
+            if future.set_running_or_notify_cancel():
+                waiters.setdefault(text, []).append(future)
+        if not waiters:
+            return
+        try:
+            vectors = self.embed_fn(list(waiters))
+        except Exception as e:
+            for futures in waiters.values():
+                for future in futures:
+                    future.set_exception(e)
+            return
+        for futures, vector in zip(waiters.values(), vectors):
+            for future in futures:
+                future.set_result(vector)
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper with two cache tiers in front of the provider:
+    1. an in-process LRU of `lru_size` vectors,
+    2. a persistent SQLite table shared by every process using the same file.
+
+    Keys are a hash of the model name and the whitespace-normalized text, so query embeddings,
+    semantic cache lookups and ingestion all reuse each other's vectors. Only misses reach the
+    provider, batched into one request, and identical concurrent misses share that request. Small
+    miss sets (single queries) go through `batcher`, when given, to be combined with other sessions'.
+    """
+    def __init__(self, underlying: Embeddings, model: str, path: str, lru_size: int = 4096,
+                 batcher: Optional[EmbeddingBatcher] = None):
+        self.underlying = underlying
+        self.batcher = batcher
+        self.model = model
+        self.path = path
+        self.lru_size = lru_size
+        self._lru: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)')
+        self._conn.commit()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        found = self._lookup(keys)
+        misses = self._misses(texts, keys, found)
+        if misses:
+            miss_texts = list(misses.values())
+            if self._use_batcher(miss_texts):
+                vectors = single_flight.do(self._flight_key(misses), lambda: self.batcher.embed(miss_texts))
+            else:
+                vectors = single_flight.do(
+                    self._flight_key(misses), lambda: self.underlying.embed_documents(miss_texts)
+                )
+            self._store(dict(zip(misses, vectors)), found)
+        return [found[key] for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # The SQLite tier is blocking I/O; keep it off the shared event loop
+        keys = [self._key(text) for text in texts]
+        found = await asyncio.to_thread(self._lookup, keys)
+        misses = self._misses(texts, keys, found)
+        if misses:
+            miss_texts = list(misses.values())
+            if self._use_batcher(miss_texts):
+                vectors = await single_flight.ado(self._flight_key(misses), lambda: self.batcher.aembed(miss_texts))
+            else:
+                vectors = await single_flight.ado(
+                    self._flight_key(misses), lambda: self.underlying.aembed_documents(miss_texts)
+                )
+            await asyncio.to_thread(self._store, dict(zip(misses, vectors)), found)
+        return [found[key] for key in keys]
+
+    def _key(self, text: str) -> str:
+        normalized = ' '.join(text.split())
+        return hashlib.sha256(f'{self.model}\0{normalized}'.encode('utf-8')).hexdigest()
+
+    def _use_batcher(self, texts: List[str]) -> bool:
+        # Requests that fill a batch on their own (ingestion) go straight to the provider
+        return self.batcher is not None and len(texts) < self.batcher.max_batch
+
+    @staticmethod
+    def _flight_key(misses: Dict[str, str]) -> tuple:
+        return ('embed', *misses)
+
+    @staticmethod
+    def _misses(texts: List[str], keys: List[str], found: Dict[str, List[float]]) -> Dict[str, str]:
+        misses = {}
+        for text, key in zip(texts, keys):
+            if key not in found and key not in misses:
+                misses[key] = text
+        return misses
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    found[key] = self._lru[key]
+            pending = [key for key in set(keys) if key not in found]
+            for start in range(0, len(pending), 500):
+                batch = pending[start:start + 500]
+                rows = self._conn.execute(
+                    f'SELECT key, vector FROM embeddings WHERE key IN ({",".join("?" * len(batch))})', batch
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32).tolist()
+                    found[key] = vector
+                    self._remember(key, vector)
+        return found
+
+    def _store(self, vectors: Dict[str, List[float]], found: Dict[str, List[float]]):
+        found.update(vectors)
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)',
+                [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in vectors.items()],
+            )
+            self._conn.commit()
+            for key, vector in vectors.items():
+                self._remember(key, vector)
+
+    def _remember(self, key: str, vector: List[float]):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+_embeddings: Dict[str, CachedEmbeddings] = {}
+_embeddings_lock = threading.Lock()
+
+def get_embeddings(model: Optional[str] = None) -> CachedEmbeddings:
+    """
+    Return the process-wide cached embeddings for `model` (defaults to `EMBEDDINGS['model']` in config.py).
+    The provider client reuses the shared HTTP connection pool from LLMRegistry, and query misses from
+    every session are micro-batched (`batch_size` texts or `batch_wait` seconds).
+    """
+    model = model or EMBEDDINGS['model']
+    with _embeddings_lock:
+        if model not in _embeddings:
+            http_client, http_async_client = LLMRegistry.get_http_clients()
+            underlying = OpenAIEmbeddings(model=model, http_client=http_client, http_async_client=http_async_client)
+            batcher = EmbeddingBatcher(
+                underlying.embed_documents, max_batch=EMBEDDINGS['batch_size'], max_wait=EMBEDDINGS['batch_wait'],
+                max_workers=EMBEDDINGS['batch_workers'], timeout=EMBEDDINGS['batch_timeout'],
+            )
+            _embeddings[model] = CachedEmbeddings(
+                underlying, model, path=EMBEDDINGS['path'], lru_size=EMBEDDINGS['lru_size'], batcher=batcher
+            )
+    return _embeddings[model]
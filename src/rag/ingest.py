@@ -0,0 +1,274 @@
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import typer
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from config import INGEST
+from src.rag.doc_store import get_doc_store
+from src.rag.embeddings import get_embeddings
+from src.rag.lexical import get_lexical_index
+from src.rag.semantic_cache import get_semantic_cache
+from src.rag.vector_store import ID_SEPARATOR, build_vector_store
+
+app = typer.Typer(help='Load PDFs into a vector index and its local doc store and lexical index.')
+
+###########################################################################################
+#################                    PIPELINE              ################################
+###########################################################################################
+def iter_pages(paths: Iterable[str]) -> Iterator[Document]:
+    """ Yield PDF pages one at a time, file by file. """
+    for path in paths:
+        yield from PyPDFLoader(path).lazy_load()
+
+def iter_chunks(pages: Iterable[Document], splitter: RecursiveCharacterTextSplitter) -> Iterator[Document]:
+    """
+    Split each page as it arrives. Chunks are numbered per source and get the record ID
+    `<source>#<chunk_id>`, so re-running an ingest overwrites records instead of duplicating them.
+    """
+    next_ids: Dict[str, int] = {}
+    for page in pages:
+        for chunk in splitter.split_documents([page]):
+            source = chunk.metadata['source']
+            chunk_id = next_ids.get(source, 0)
+            next_ids[source] = chunk_id + 1
+            chunk.metadata['chunk_id'] = chunk_id
+            chunk.metadata['file_name'] = os.path.basename(source)
+            chunk.id = f'{source}{ID_SEPARATOR}{chunk_id}'
+            yield chunk
+
+def iter_batches(items: Iterable, batch_size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def chunk_hash(chunk: Document) -> str:
+    """ Stable hash of everything written for a chunk: its text and metadata. """
+    payload = json.dumps([chunk.page_content, chunk.metadata], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def iter_changed(chunks: Iterable[Document], manifest: 'Manifest', seen: Dict[str, Set[str]],
+                 force: bool = False, lookup_size: int = 500) -> Iterator[Tuple[Document, str]]:
+    """
+    Yield (chunk, hash) for chunks that are new or differ from the manifest, recording every chunk
+    ID in `seen` (per source) so chunks that disappeared can be found afterwards.
+    """
+    for group in iter_batches(chunks, lookup_size):
+        known = {} if force else manifest.hashes([chunk.id for chunk in group])
+        for chunk in group:
+            seen.setdefault(chunk.metadata['source'], set()).add(chunk.id)
+            digest = chunk_hash(chunk)
+            if known.get(chunk.id) != digest:
+                yield chunk, digest
+
+class Manifest:
+    """
+    What an index currently holds: one row per chunk with its record ID, source, chunk_id and
+    content hash, in a SQLite file next to the other per-index data.
+
+    Ingestion diffs against it to write only new or changed chunks and to delete chunks that
+    disappeared. Rows are recorded only once their chunks are durably written, so the manifest is
+    also the resume point of an interrupted run.
+    """
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS chunks ('
+            'id TEXT PRIMARY KEY, source TEXT NOT NULL, chunk_id REAL NOT NULL, hash TEXT NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS chunks_source ON chunks (source)')
+        self._conn.commit()
+
+    def hashes(self, ids: List[str]) -> Dict[str, str]:
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT id, hash FROM chunks WHERE id IN ({",".join("?" * len(ids))})', ids
+            ).fetchall()
+        return dict(rows)
+
+    def record(self, rows: List[Tuple[str, str, float, str]]):
+        """ Insert or replace (id, source, chunk_id, hash) rows. """
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO chunks (id, source, chunk_id, hash) VALUES (?, ?, ?, ?)', rows
+            )
+            self._conn.commit()
+
+    def chunks(self, source: str) -> List[Tuple[str, float]]:
+        """ (id, chunk_id) of every recorded chunk of `source`. """
+        with self._lock:
+            return self._conn.execute('SELECT id, chunk_id FROM chunks WHERE source = ?', (source,)).fetchall()
+
+    def sources(self) -> Set[str]:
+        with self._lock:
+            return {row[0] for row in self._conn.execute('SELECT DISTINCT source FROM chunks')}
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            self._conn.executemany('DELETE FROM chunks WHERE id = ?', [(record_id,) for record_id in ids])
+            self._conn.commit()
+
+def ingest_documents(paths: List[str], index_name: str, vector_store_config: Optional[dict] = None,
+                     batch_size: int = INGEST['batch_size'], concurrency: int = INGEST['concurrency'],
+                     chunk_size: int = INGEST['chunk_size'], chunk_overlap: int = INGEST['chunk_overlap'],
+                     checkpoint_every: int = INGEST['checkpoint_every'], manifest_path: Optional[str] = None,
+                     prune: bool = False, force: bool = False) -> int:
+    """
+    Incrementally sync `paths` into `index_name`.
+
+    Pages are split as they load and each chunk is hashed and compared with the index's manifest.
+    Only new or changed chunks are embedded, `batch_size` at a time, and written by up to
+    `concurrency` workers to the vector index, the doc store and the lexical index. At most `concurrency` batches are in
+    flight, so memory stays flat regardless of document size. Chunks that no longer exist in a
+    source are deleted; with `prune`, so are sources that are not part of this run. `force` rewrites
+    every chunk.
+
+    Finished batches are recorded in the manifest every `checkpoint_every` batches, so an
+    interrupted run resumes from there. Returns the number of chunks written and deleted.
+    """
+    embeddings = get_embeddings()
+    store = build_vector_store(index_name, embeddings, vector_store_config)
+    doc_store = get_doc_store(index_name)
+    lexical_index = get_lexical_index(index_name)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    manifest = Manifest(manifest_path or os.path.join(INGEST['manifest_dir'], f'{index_name}.sqlite'))
+
+    seen: Dict[str, Set[str]] = {}
+    unrecorded = []
+    written = 0
+
+    def write_batch(batch: List[Tuple[Document, str]]) -> list:
+        docs = [doc for doc, _ in batch]
+        texts = [doc.page_content for doc in docs]
+        vectors = embeddings.embed_documents(texts)
+        store.add_embeddings(texts, vectors, [doc.metadata for doc in docs], [doc.id for doc in docs])
+        doc_store.add_documents(docs, rebuild=False)
+        lexical_index.add_documents(docs)
+        return [(doc.id, doc.metadata['source'], doc.metadata['chunk_id'], digest) for doc, digest in batch]
+
+    def persist():
+        nonlocal written
+        # A local index only keeps writes that are saved; save it before the manifest records them
+        if hasattr(store, 'save'):
+            store.save()
+        manifest.record(unrecorded)
+        written += len(unrecorded)
+        unrecorded.clear()
+
+    completed = 0
+    pending = set()
+    changed = iter_changed(iter_chunks(iter_pages(paths), splitter), manifest, seen, force=force)
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='ingest') as executor:
+        try:
+            for batch in iter_batches(changed, batch_size):
+                while len(pending) >= concurrency:
+                    completed += _drain(pending, unrecorded, FIRST_COMPLETED)
+                    if completed >= checkpoint_every:
+                        persist()
+                        completed = 0
+                pending.add(executor.submit(write_batch, batch))
+            _drain(pending, unrecorded)
+        finally:
+            # Record whatever finished before a failure so the next run does not redo it
+            wait(pending)
+            for future in pending:
+                if not future.cancelled() and future.exception() is None:
+                    unrecorded.extend(future.result())
+            persist()
+
+    deleted = _delete_stale(manifest, store, doc_store, lexical_index, seen, prune)
+    doc_store.rebuild_documents(seen)
+    if written or deleted:
+        get_semantic_cache().invalidate_index(index_name)
+    typer.secho(f'{index_name}: {written} chunks written, {deleted} deleted, {len(seen)} sources checked',
+                fg=typer.colors.GREEN)
+    return written + deleted
+
+def _drain(pending: set, unrecorded: list, return_when: str = ALL_COMPLETED) -> int:
+    """ Wait for in-flight batches, collect their manifest rows, and re-raise the first failure. """
+    done, _ = wait(pending, return_when=return_when)
+    for future in done:
+        pending.discard(future)
+        unrecorded.extend(future.result())
+    return len(done)
+
+def _delete_stale(manifest: Manifest, store, doc_store, lexical_index, seen: Dict[str, Set[str]], prune: bool) -> int:
+    """
+    Delete chunks the manifest holds for a checked source but this run did not produce (the source
+    shrank), and with `prune` every chunk of sources outside this run.
+    """
+    stale = {}
+    for source in seen:
+        stale[source] = [(record_id, chunk_id) for record_id, chunk_id in manifest.chunks(source)
+                         if record_id not in seen[source]]
+    if prune:
+        for source in manifest.sources() - set(seen):
+            stale[source] = manifest.chunks(source)
+    ids = [record_id for rows in stale.values() for record_id, _ in rows]
+    if not ids:
+        return 0
+    for start in range(0, len(ids), 1000):
+        store.delete(ids=ids[start:start + 1000])
+    if hasattr(store, 'save'):
+        store.save()
+    for source, rows in stale.items():
+        if source in seen:
+            doc_store.delete_chunks(source, [chunk_id for _, chunk_id in rows])
+        else:
+            doc_store.delete_source(source)
+    lexical_index.delete(ids)
+    manifest.delete(ids)
+    return len(ids)
+
+def _expand_paths(paths: List[str]) -> List[str]:
+    """ Accept PDF files and directories (searched recursively for PDFs), in a stable order. """
+    expanded = []
+    for path in paths:
+        if os.path.isdir(path):
+            expanded.extend(sorted(glob.glob(os.path.join(path, '**', '*.pdf'), recursive=True)))
+        else:
+            expanded.append(path)
+    return expanded
+
+###########################################################################################
+#################                       CLI                ################################
+###########################################################################################
+@app.command()
+def main(
+    paths: List[str] = typer.Argument(..., help='PDF files or directories of PDFs.'),
+    index_name: str = typer.Option(..., '--index', help='Vector index to write to.'),
+    backend: str = typer.Option('pinecone', help='`pinecone` or `local`.'),
+    path: Optional[str] = typer.Option(None, help='Directory of a local index.'),
+    batch_size: int = typer.Option(INGEST['batch_size'], help='Chunks per embedding request.'),
+    concurrency: int = typer.Option(INGEST['concurrency'], help='Batches written in parallel.'),
+    chunk_size: int = typer.Option(INGEST['chunk_size']),
+    chunk_overlap: int = typer.Option(INGEST['chunk_overlap']),
+    checkpoint_every: int = typer.Option(INGEST['checkpoint_every'], help='Batches between manifest updates.'),
+    prune: bool = typer.Option(False, help='Delete indexed sources that are not in PATHS.'),
+    force: bool = typer.Option(False, help='Rewrite every chunk, ignoring the manifest.'),
+):
+    vector_store_config = {'backend': backend}
+    if path:
+        vector_store_config['path'] = path
+    ingest_documents(_expand_paths(paths), index_name, vector_store_config, batch_size=batch_size,
+                     concurrency=concurrency, chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                     checkpoint_every=checkpoint_every, prune=prune, force=force)
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,104 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Tuple
+
+from langchain_core.documents import Document
+
+from config import LEXICAL_INDEX_DIR
+
+_WORD = re.compile(r'[A-Za-z0-9_]+(?:\.[A-Za-z0-9_]+)*')
+_CAMEL = re.compile(r'[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+')
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased terms for lexical matching. Identifiers are indexed whole and by their parts, so
+    `omni.isaac.core.ArticulationView` matches `omni.isaac.core.articulationview`, `articulationview`,
+    `articulation` and `view`, and `max_episode_length` matches `episode`.
+    """
+    terms = []
+    for word in _WORD.findall(text):
+        whole = word.lower()
+        parts = [part.lower() for segment in re.split(r'[._]', word) for part in [segment, *_CAMEL.findall(segment)]]
+        terms.append(whole)
+        terms.extend(part for part in dict.fromkeys(parts) if part and part != whole)
+    return terms
+
+class LexicalIndex:
+    """
+    BM25 inverted index over the chunks of a vector index, in SQLite FTS5.
+
+    Chunks are pre-tokenized with `tokenize`, so exact identifiers (class names, config keys, module
+    paths) are terms of their own. The index is filled at ingest time alongside the doc store and
+    keyed by the same record IDs as the vector index.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS records ('
+            'rowid INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, text TEXT NOT NULL, metadata TEXT NOT NULL)'
+        )
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS fts USING fts5(terms, tokenize=\"unicode61 tokenchars '._'\")"
+        )
+        self._conn.commit()
+
+    def add_documents(self, docs: Iterable[Document]):
+        """ Insert or replace chunks by `doc.id`. """
+        with self._lock:
+            for doc in docs:
+                row = self._conn.execute('SELECT rowid FROM records WHERE id = ?', (doc.id,)).fetchone()
+                if row is not None:
+                    self._conn.execute('DELETE FROM fts WHERE rowid = ?', row)
+                    self._conn.execute('DELETE FROM records WHERE rowid = ?', row)
+                cursor = self._conn.execute(
+                    'INSERT INTO records (id, text, metadata) VALUES (?, ?, ?)',
+                    (doc.id, doc.page_content, json.dumps(doc.metadata, default=str)),
+                )
+                self._conn.execute(
+                    'INSERT INTO fts (rowid, terms) VALUES (?, ?)',
+                    (cursor.lastrowid, ' '.join(tokenize(doc.page_content))),
+                )
+            self._conn.commit()
+
+    def delete(self, ids: Iterable[str]):
+        with self._lock:
+            for record_id in ids:
+                row = self._conn.execute('SELECT rowid FROM records WHERE id = ?', (record_id,)).fetchone()
+                if row is not None:
+                    self._conn.execute('DELETE FROM fts WHERE rowid = ?', row)
+                    self._conn.execute('DELETE FROM records WHERE rowid = ?', row)
+            self._conn.commit()
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[Document, float]]:
+        """ The `k` best chunks by BM25, best first, with their scores (higher is better). """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        match = ' OR '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT records.id, records.text, records.metadata, bm25(fts) AS score '
+                'FROM fts JOIN records ON records.rowid = fts.rowid '
+                'WHERE fts MATCH ? ORDER BY score LIMIT ?',
+                (match, k),
+            ).fetchall()
+        # FTS5 reports BM25 negated so that ascending order is best first
+        return [(Document(id=record_id, page_content=text, metadata=json.loads(metadata)), -score)
+                for record_id, text, metadata, score in rows]
+
+_lexical_indexes: Dict[str, LexicalIndex] = {}
+_lexical_indexes_lock = threading.Lock()
+
+def get_lexical_index(index_name: str) -> LexicalIndex:
+    """ Return the process-wide LexicalIndex for a vector index, stored under LEXICAL_INDEX_DIR. """
+    with _lexical_indexes_lock:
+        if index_name not in _lexical_indexes:
+            _lexical_indexes[index_name] = LexicalIndex(os.path.join(LEXICAL_INDEX_DIR, f'{index_name}.sqlite'))
+    return _lexical_indexes[index_name]
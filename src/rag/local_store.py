@@ -0,0 +1,584 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+# Rows scored per block when scanning a quantized matrix, bounding the float32 working set
+_SCAN_BLOCK_ROWS = 65536
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector store: normalized embeddings searched by brute-force cosine similarity.
+
+    - Drop-in for PineconeStore behind the retriever interface (`as_retriever(search_kwargs={"k": ...})`),
+      including Pinecone-style metadata filters (`$eq`, `$ne`, `$in`, `$nin`, `$gt(e)`, `$lt(e)`, `$and`, `$or`)
+      and the metadata-only fetch methods.
+    - Optional approximate search for large corpora: with `n_lists` set, an inverted-file index (k-means
+      coarse quantizer) is built lazily once the store holds `ivf_min_size` vectors and only the `n_probe`
+      closest lists are scanned.
+    - `save` writes a directory of raw matrices plus a sidecar SQLite table of ids, text and metadata.
+      Opening a saved store memory-maps the matrices read-only (zero-copy, shared through the page
+      cache by every process) and reads records from the sidecar on demand, so start-up cost and RSS do
+      not grow with the corpus. Search scans the `quantization` matrix (float16 or int8) and rescores
+      the best `k * rescore_factor` candidates against the full-precision matrix.
+    - Writing to an opened store first copies it into memory; call `save` to publish the change.
+      Saving again to the same path only appends the rows added since the last save, so periodic
+      checkpoints (ingestion) cost I/O proportional to the change. Saved rows are never modified in
+      place: a save that replaces rows rewrites the files under temporary names.
+    """
+    def __init__(self, embedding: Embeddings, path: str = None, n_lists: int = None, n_probe: int = 8,
+                 ivf_min_size: int = 20000, quantization: Optional[str] = 'float16', rescore_factor: int = 4):
+        if quantization not in (None, 'float16', 'int8'):
+            raise ValueError(f"Unsupported quantization: {quantization}")
+        self.embedding = embedding
+        self.path = path
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.ivf_min_size = ivf_min_size
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+        self._lock = threading.Lock()
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._buffer = None  # Backing array of a writable `_vectors`, grown geometrically
+        self._quantized = None
+        self._scales = None
+        self._records = _MemoryRecords()
+        self._ivf = None
+        # Rows [0, _saved_count) match the files at `path`, except the replaced rows in `_dirty`
+        self._saved_count = 0
+        self._dirty = set()
+        if path and os.path.exists(os.path.join(path, 'index.json')):
+            self._open(path)
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def __len__(self):
+        return len(self._records)
+
+    ###########################################################################################
+    #################                 WRITE METHODS            ################################
+    ###########################################################################################
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, *,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        return self.add_embeddings(texts, self.embedding.embed_documents(texts), metadatas, ids)
+
+    def add_embeddings(self, texts: List[str], embeddings: Sequence[Sequence[float]],
+                       metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None) -> List[str]:
+        """ Insert or replace records with precomputed embeddings. """
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        vectors = self._normalize(np.asarray(embeddings, dtype=np.float32))
+        with self._lock:
+            self._make_writable()
+            if self._vectors.size == 0:
+                self._vectors = np.zeros((0, vectors.shape[1]), dtype=np.float32)
+            new_rows = []
+            for idx, record_id in enumerate(ids):
+                position = self._records.position(record_id)
+                if position is None:
+                    new_rows.append(idx)
+                    continue
+                self._vectors[position] = vectors[idx]
+                self._records.set(position, record_id, texts[idx], metadatas[idx])
+                if position < self._saved_count:
+                    self._dirty.add(position)
+            if new_rows:
+                self._append_vectors(vectors[new_rows])
+                for idx in new_rows:
+                    self._records.append(ids[idx], texts[idx], metadatas[idx])
+            self._ivf = None
+        return list(ids)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if not ids:
+            return False
+        with self._lock:
+            self._make_writable()
+            drop = {self._records.position(record_id) for record_id in ids} - {None}
+            if not drop:
+                return False
+            keep = [idx for idx in range(len(self._records)) if idx not in drop]
+            self._vectors = self._vectors[keep]
+            self._buffer = None
+            self._records.keep(keep)
+            self._ivf = None
+            # Positions shift, so the next save rewrites the files
+            self._saved_count = 0
+        return True
+
+    def _make_writable(self):
+        """ Copy a memory-mapped store into memory before the first write. Caller holds the lock. """
+        if isinstance(self._records, _SQLiteRecords):
+            self._vectors = np.array(self._vectors, dtype=np.float32)
+            self._buffer = None
+            self._records = self._records.to_memory()
+            self._quantized = self._scales = None
+
+    def _append_vectors(self, rows: np.ndarray):
+        """ Append rows to the writable matrix with amortized O(1) copies per row. Caller holds the lock. """
+        count = len(self._vectors)
+        if self._buffer is None or count + len(rows) > len(self._buffer):
+            buffer = np.empty((max(count + len(rows), 2 * count, 1024), rows.shape[1]), dtype=np.float32)
+            buffer[:count] = self._vectors
+            self._buffer = buffer
+        self._buffer[count:count + len(rows)] = rows
+        # Searches hold on to the previous view; rows past its end are never read through it
+        self._vectors = self._buffer[:count + len(rows)]
+
+    ###########################################################################################
+    #################                 SEARCH METHODS           ################################
+    ###########################################################################################
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[dict] = None,
+                                     **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self.embedding.embed_query(query), k=k, filter=filter)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, filter: Optional[dict] = None,
+                                    **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter)]
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4,
+                                               filter: Optional[dict] = None) -> List[Tuple[Document, float]]:
+        query = self._normalize(np.asarray(embedding, dtype=np.float32))
+        with self._lock:
+            vectors, quantized, scales, records = self._vectors, self._quantized, self._scales, self._records
+            candidates = self._candidates(query)
+        if len(records) == 0:
+            return []
+        if filter:
+            matching = np.asarray(records.matching(filter), dtype=np.int64)
+            candidates = matching if candidates is None else np.intersect1d(candidates, matching)
+        if candidates is not None and len(candidates) == 0:
+            return []
+
+        if quantized is None:
+            scores = vectors[candidates] @ query if candidates is not None else vectors @ query
+            top = _top_k(scores, k)
+            positions = candidates[top] if candidates is not None else top
+            top_scores = scores[top]
+        else:
+            approx = _scan(quantized, scales, query, candidates)
+            shortlist = _top_k(approx, k * self.rescore_factor)
+            shortlist = candidates[shortlist] if candidates is not None else shortlist
+            shortlist = np.sort(shortlist)  # ascending rows read the memory map sequentially
+            exact = vectors[shortlist] @ query
+            top = _top_k(exact, k)
+            positions, top_scores = shortlist[top], exact[top]
+
+        results = []
+        for position, score in zip(positions, top_scores):
+            record_id, text, metadata = records.get(int(position))
+            results.append((self._to_document(record_id, text, metadata), float(score)))
+        return results
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        return lambda score: (score + 1.0) / 2.0
+
+    ###########################################################################################
+    #################          METADATA-ONLY FETCH METHODS     ################################
+    ###########################################################################################
+    def fetch_by_ids(self, ids: List[str]) -> List[Document]:
+        with self._lock:
+            records = self._records
+        positions = [records.position(record_id) for record_id in ids]
+        return [self._to_document(*records.get(pos)) for pos in positions if pos is not None]
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        return self.fetch_by_ids(list(ids))
+
+    def list_ids(self, prefix: str = None) -> Iterable[str]:
+        with self._lock:
+            records = self._records
+        return records.ids(prefix)
+
+    def fetch_by_metadata(self, filter: dict, max_records: Optional[int] = None, **kwargs: Any) -> List[Document]:
+        with self._lock:
+            records = self._records
+        positions = records.matching(filter)
+        if max_records:
+            positions = positions[:max_records]
+        return [self._to_document(*records.get(pos)) for pos in positions]
+
+    def fetch_source(self, source: str, max_records: Optional[int] = None) -> List[Document]:
+        docs = self.fetch_by_metadata({'source': {'$eq': source}}, max_records=max_records)
+        return sorted(docs, key=lambda doc: float(doc.metadata.get('chunk_id', 0)))
+
+    ###########################################################################################
+    #################                  PERSISTENCE             ################################
+    ###########################################################################################
+    def save(self, path: str = None):
+        """
+        Write the store to `path` and reopen it memory-mapped. Files are written under temporary names
+        and swapped in, so processes that have the old files mapped keep a consistent view.
+
+        Saving a writable store back to the path it was loaded from or last saved to, when it has only
+        gained rows, appends them (see `_save_incremental`) and keeps the store in memory for further
+        writes. Replaced or deleted rows always take the full rewrite, since overwriting mapped rows in
+        place would let readers see a row half old and half new.
+        """
+        path = path or self.path
+        os.makedirs(path, exist_ok=True)
+        with self._lock:
+            if isinstance(self._records, _SQLiteRecords) and path == self.path:
+                return
+            if path == self.path and self._saved_count > 0 and not self._dirty:
+                self._save_incremental(path)
+                return
+            vectors = np.ascontiguousarray(self._vectors, dtype=np.float32)
+            files = self._matrices(vectors)
+            for name, matrix in files.items():
+                matrix.tofile(os.path.join(path, name + '.tmp'))
+            _SQLiteRecords.write(os.path.join(path, 'records.sqlite.tmp'), self._records)
+            header = {'count': len(self._records), 'dim': int(vectors.shape[1]) if vectors.size else 0,
+                      'quantization': self.quantization}
+            with open(os.path.join(path, 'index.json.tmp'), 'w', encoding='utf-8') as f:
+                json.dump(header, f)
+            for name in list(files) + ['records.sqlite', 'index.json']:
+                os.replace(os.path.join(path, name + '.tmp'), os.path.join(path, name))
+            for stale in {'vectors.q', 'scales.f32'} - set(files):
+                if os.path.exists(os.path.join(path, stale)):
+                    os.remove(os.path.join(path, stale))
+            self.path = path
+            self._open(path)
+
+    def _save_incremental(self, path: str):
+        """
+        Append the rows added since the last save to the saved files, then publish the new count
+        through `index.json`. Rows below the saved count are left untouched, and readers only use rows
+        below the count in the header they opened, so appended rows stay invisible to them. Caller
+        holds the lock.
+        """
+        start, count = self._saved_count, len(self._records)
+        if start == count:
+            return
+        for name, matrix in self._matrices(np.asarray(self._vectors[start:count], dtype=np.float32)).items():
+            row_bytes = matrix.itemsize * (matrix.shape[1] if matrix.ndim > 1 else 1)
+            with open(os.path.join(path, name), 'r+b') as f:
+                # Drop anything past the saved count (an interrupted save) before appending
+                f.seek(start * row_bytes)
+                f.write(matrix.tobytes())
+                f.truncate()
+        _SQLiteRecords.append(os.path.join(path, 'records.sqlite'), self._records, start)
+        self._write_header(path, count, self._vectors.shape[1])
+        self._saved_count = count
+
+    def _matrices(self, vectors: np.ndarray) -> dict:
+        """ The files holding `vectors`: full precision plus the quantized scan matrix. """
+        files = {'vectors.f32': vectors}
+        if self.quantization == 'float16':
+            files['vectors.q'] = vectors.astype(np.float16)
+        elif self.quantization == 'int8':
+            quantized, scales = _quantize_int8(vectors)
+            files['vectors.q'] = quantized
+            files['scales.f32'] = scales
+        return files
+
+    def _write_header(self, path: str, count: int, dim: int):
+        header = {'count': count, 'dim': dim, 'quantization': self.quantization}
+        with open(os.path.join(path, 'index.json.tmp'), 'w', encoding='utf-8') as f:
+            json.dump(header, f)
+        os.replace(os.path.join(path, 'index.json.tmp'), os.path.join(path, 'index.json'))
+
+    def _open(self, path: str):
+        """ Memory-map a saved store. Nothing but the header is read eagerly. """
+        with open(os.path.join(path, 'index.json'), 'r', encoding='utf-8') as f:
+            header = json.load(f)
+        count, dim = header['count'], header['dim']
+        self.quantization = header['quantization']
+        if count == 0:
+            self._vectors = np.zeros((0, dim), dtype=np.float32)
+            self._quantized = self._scales = None
+        else:
+            self._vectors = np.memmap(os.path.join(path, 'vectors.f32'), dtype=np.float32, mode='r', shape=(count, dim))
+            self._quantized = self._scales = None
+            if self.quantization == 'float16':
+                self._quantized = np.memmap(os.path.join(path, 'vectors.q'), dtype=np.float16, mode='r', shape=(count, dim))
+            elif self.quantization == 'int8':
+                self._quantized = np.memmap(os.path.join(path, 'vectors.q'), dtype=np.int8, mode='r', shape=(count, dim))
+                self._scales = np.memmap(os.path.join(path, 'scales.f32'), dtype=np.float32, mode='r', shape=(count,))
+        self._buffer = None
+        self._records = _SQLiteRecords(os.path.join(path, 'records.sqlite'), count)
+        self._ivf = None
+        self._saved_count = count
+        self._dirty = set()
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None, *,
+                   ids: Optional[List[str]] = None, **kwargs: Any) -> 'LocalVectorStore':
+        store = cls(embedding, **kwargs)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
+
+    ###########################################################################################
+    #################               APPROXIMATE INDEX          ################################
+    ###########################################################################################
+    def _candidates(self, query: np.ndarray) -> Optional[np.ndarray]:
+        """ Candidate rows from the IVF index, or None for an exhaustive scan. Caller holds the lock. """
+        if not self.n_lists or len(self._records) < max(self.ivf_min_size, self.n_lists):
+            return None
+        if self._ivf is None:
+            self._ivf = _build_ivf(self._vectors, self.n_lists)
+        centroids, lists = self._ivf
+        probe = _top_k(centroids @ query, self.n_probe)
+        return np.sort(np.concatenate([lists[idx] for idx in probe]))
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1.0)
+
+    @staticmethod
+    def _to_document(record_id: str, text: str, metadata: dict) -> Document:
+        return Document(id=record_id, page_content=text, metadata=dict(metadata))
+
+class _MemoryRecords:
+    """ Ids, text and metadata of a writable store, held in parallel lists. """
+    def __init__(self, ids: List[str] = None, texts: List[str] = None, metadatas: List[dict] = None):
+        self._ids = ids or []
+        self._texts = texts or []
+        self._metadatas = metadatas or []
+        self._positions = {record_id: idx for idx, record_id in enumerate(self._ids)}
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __iter__(self):
+        return zip(self._ids, self._texts, self._metadatas)
+
+    def get(self, position: int) -> Tuple[str, str, dict]:
+        return self._ids[position], self._texts[position], self._metadatas[position]
+
+    def position(self, record_id: str) -> Optional[int]:
+        return self._positions.get(record_id)
+
+    def ids(self, prefix: str = None) -> List[str]:
+        return [record_id for record_id in self._ids if prefix is None or record_id.startswith(prefix)]
+
+    def matching(self, filter: dict) -> List[int]:
+        return [idx for idx, metadata in enumerate(self._metadatas) if _matches(metadata, filter)]
+
+    def append(self, record_id: str, text: str, metadata: dict):
+        self._positions[record_id] = len(self._ids)
+        self._ids.append(record_id)
+        self._texts.append(text)
+        self._metadatas.append(dict(metadata))
+
+    def set(self, position: int, record_id: str, text: str, metadata: dict):
+        self._texts[position] = text
+        self._metadatas[position] = dict(metadata)
+
+    def keep(self, positions: List[int]):
+        self._ids = [self._ids[idx] for idx in positions]
+        self._texts = [self._texts[idx] for idx in positions]
+        self._metadatas = [self._metadatas[idx] for idx in positions]
+        self._positions = {record_id: idx for idx, record_id in enumerate(self._ids)}
+
+class _SQLiteRecords:
+    """
+    Read-only sidecar table of a saved store, keyed by row position. `source` is indexed so the
+    common per-document filter does not scan every record. Rows at or past `count` belong to a later
+    save than the one this reader opened and are ignored.
+    """
+    def __init__(self, path: str, count: int):
+        self._count = count
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT id, text, metadata FROM records WHERE position < ? ORDER BY position', (self._count,)
+            ).fetchall()
+        return ((record_id, text, json.loads(metadata)) for record_id, text, metadata in rows)
+
+    def get(self, position: int) -> Tuple[str, str, dict]:
+        with self._lock:
+            record_id, text, metadata = self._conn.execute(
+                'SELECT id, text, metadata FROM records WHERE position = ?', (position,)
+            ).fetchone()
+        return record_id, text, json.loads(metadata)
+
+    def position(self, record_id: str) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT position FROM records WHERE id = ? AND position < ?', (record_id, self._count)
+            ).fetchone()
+        return row[0] if row else None
+
+    def ids(self, prefix: str = None) -> List[str]:
+        with self._lock:
+            if prefix is None:
+                rows = self._conn.execute(
+                    'SELECT id FROM records WHERE position < ? ORDER BY position', (self._count,)
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    'SELECT id FROM records WHERE substr(id, 1, ?) = ? AND position < ? ORDER BY position',
+                    (len(prefix), prefix, self._count),
+                ).fetchall()
+        return [row[0] for row in rows]
+
+    def matching(self, filter: dict) -> List[int]:
+        source = _source_equality(filter)
+        with self._lock:
+            if source is not None:
+                rows = self._conn.execute(
+                    'SELECT position FROM records WHERE source = ? AND position < ? ORDER BY position',
+                    (source, self._count),
+                ).fetchall()
+                return [row[0] for row in rows]
+            cursor = self._conn.execute(
+                'SELECT position, metadata FROM records WHERE position < ? ORDER BY position', (self._count,)
+            )
+            return [position for position, metadata in cursor if _matches(json.loads(metadata), filter)]
+
+    def to_memory(self) -> _MemoryRecords:
+        ids, texts, metadatas = [], [], []
+        for record_id, text, metadata in self:
+            ids.append(record_id)
+            texts.append(text)
+            metadatas.append(metadata)
+        return _MemoryRecords(ids, texts, metadatas)
+
+    @staticmethod
+    def write(path: str, records: Iterable[Tuple[str, str, dict]]):
+        if os.path.exists(path):
+            os.remove(path)
+        conn = sqlite3.connect(path)
+        conn.execute(
+            'CREATE TABLE records (position INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, source TEXT, '
+            'text TEXT NOT NULL, metadata TEXT NOT NULL)'
+        )
+        conn.executemany(
+            'INSERT INTO records (position, id, source, text, metadata) VALUES (?, ?, ?, ?, ?)',
+            ((idx, record_id, metadata.get('source'), text, json.dumps(metadata, default=str))
+             for idx, (record_id, text, metadata) in enumerate(records)),
+        )
+        conn.execute('CREATE INDEX records_source ON records (source)')
+        conn.commit()
+        conn.close()
+
+    @staticmethod
+    def append(path: str, records: '_MemoryRecords', start: int):
+        """ Replace every row from `start` on with `records[start:]`, in one transaction. """
+        rows = []
+        for position in range(start, len(records)):
+            record_id, text, metadata = records.get(position)
+            rows.append((position, record_id, metadata.get('source'), text, json.dumps(metadata, default=str)))
+        conn = sqlite3.connect(path)
+        conn.execute('DELETE FROM records WHERE position >= ?', (start,))
+        conn.executemany('INSERT INTO records (position, id, source, text, metadata) VALUES (?, ?, ?, ?, ?)', rows)
+        conn.commit()
+        conn.close()
+
+def _source_equality(filter: dict) -> Optional[str]:
+    """ The source of a `{'source': value}` or `{'source': {'$eq': value}}` filter, else None. """
+    if list(filter) != ['source']:
+        return None
+    condition = filter['source']
+    if isinstance(condition, dict):
+        return condition.get('$eq') if list(condition) == ['$eq'] else None
+    return condition
+
+def _quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """ Symmetric per-row int8 quantization; returns (int8 matrix, float32 row scales). """
+    scales = np.abs(vectors).max(axis=1) / 127.0 if len(vectors) else np.zeros(0, dtype=np.float32)
+    scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+    quantized = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return quantized, scales
+
+def _scan(quantized: np.ndarray, scales: Optional[np.ndarray], query: np.ndarray,
+          rows: Optional[np.ndarray] = None) -> np.ndarray:
+    """ Approximate scores of `query` against quantized rows, computed block by block. """
+    total = len(rows) if rows is not None else len(quantized)
+    scores = np.empty(total, dtype=np.float32)
+    for start in range(0, total, _SCAN_BLOCK_ROWS):
+        stop = min(start + _SCAN_BLOCK_ROWS, total)
+        index = rows[start:stop] if rows is not None else slice(start, stop)
+        block = np.asarray(quantized[index], dtype=np.float32) @ query
+        if scales is not None:
+            block *= scales[index]
+        scores[start:stop] = block
+    return scores
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """ Indices of the `k` highest scores, best first. """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+def _build_ivf(vectors: np.ndarray, n_lists: int, iterations: int = 10, seed: int = 0):
+    """ Spherical k-means over the normalized vectors; returns (centroids, row indices per list). """
+    rng = np.random.default_rng(seed)
+    sample_rows = np.sort(rng.choice(len(vectors), size=min(len(vectors), n_lists * 64), replace=False))
+    sample = np.asarray(vectors[sample_rows], dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(sample @ centroids.T, axis=1)
+        for idx in range(n_lists):
+            members = sample[assignments == idx]
+            if len(members):
+                centroid = members.sum(axis=0)
+                centroids[idx] = centroid / max(np.linalg.norm(centroid), 1e-12)
+    assignments = np.concatenate([
+        np.argmax(np.asarray(vectors[start:start + _SCAN_BLOCK_ROWS], dtype=np.float32) @ centroids.T, axis=1)
+        for start in range(0, len(vectors), _SCAN_BLOCK_ROWS)
+    ])
+    lists = [np.flatnonzero(assignments == idx) for idx in range(n_lists)]
+    return centroids, lists
+
+def _matches(metadata: dict, filter: dict) -> bool:
+    """ Evaluate a Pinecone-style metadata filter against a record's metadata. """
+    for key, condition in filter.items():
+        if key == '$and':
+            if not all(_matches(metadata, sub) for sub in condition):
+                return False
+        elif key == '$or':
+            if not any(_matches(metadata, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for op, operand in condition.items():
+                if not _compare(value, op, operand):
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+def _compare(value: Any, op: str, operand: Any) -> bool:
+    if op == '$eq':
+        return value == operand
+    if op == '$ne':
+        return value != operand
+    if op == '$in':
+        return value in operand
+    if op == '$nin':
+        return value not in operand
+    if value is None:
+        return False
+    if op == '$gt':
+        return value > operand
+    if op == '$gte':
+        return value >= operand
+    if op == '$lt':
+        return value < operand
+    if op == '$lte':
+        return value <= operand
+    raise ValueError(f"Unsupported filter operator: {op}")
@@ -0,0 +1,136 @@
+import asyncio
+from typing import Callable, Dict, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+from pydantic import ConfigDict
+
+from src.rag.lexical import LexicalIndex, get_lexical_index
+from src.rag.vector_store import build_vector_store
+from src.utils.concurrency import thread_map
+
+class HybridRetriever(BaseRetriever):
+    """
+    Dense + lexical retrieval fused by reciprocal rank.
+
+    The vector store and the BM25 index are queried concurrently for `fetch_k` candidates each, and
+    every chunk scores `sum(1 / (rrf_k + rank))` over the lists it appears in. Chunks are identified
+    by (source, chunk_id), so the same chunk found by both sides counts once. A side that fails or
+    exceeds `timeout` contributes nothing instead of failing the query.
+    """
+    vector_store: VectorStore
+    lexical_index: LexicalIndex
+    k: int = 3
+    fetch_k: int = 10
+    rrf_k: int = 60
+    timeout: Optional[float] = 10.0
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        searches = [
+            lambda: self.vector_store.similarity_search(query, k=self.fetch_k),
+            lambda: [doc for doc, _ in self.lexical_index.search(query, k=self.fetch_k)],
+        ]
+        ranked = thread_map(lambda search: search(), searches, timeout=self.timeout, default=[])
+        return _fuse(ranked, self.rrf_k, self.k, _doc_key)
+
+    async def _aget_relevant_documents(self, query: str, *,
+                                       run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        return await asyncio.to_thread(self._get_relevant_documents, query, run_manager=run_manager.get_sync())
+
+class FederatedRetriever(BaseRetriever):
+    """
+    One ranked list over several vector indexes.
+
+    The query is embedded once and every index is searched concurrently for `fetch_k` chunks, each
+    with its own timeout; an index that fails or times out contributes nothing. The per-index lists
+    are fused by reciprocal rank like HybridRetriever's, since raw scores are not comparable across
+    indexes (different metrics, densities and score scales), and the merged list is cut to `k`. Each
+    chunk's `index_name` metadata records the index it came from.
+    """
+    vector_stores: Dict[str, VectorStore]
+    timeouts: Dict[str, Optional[float]] = {}
+    k: int = 3
+    fetch_k: int = 10
+    rrf_k: int = 60
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        embedding = next(iter(self.vector_stores.values())).embeddings.embed_query(query)
+        names = list(self.vector_stores)
+
+        def search(name):
+            docs = self.vector_stores[name].similarity_search_by_vector(embedding, k=self.fetch_k)
+            for doc in docs:
+                doc.metadata['index_name'] = name
+            return docs
+
+        ranked = thread_map(search, names, timeout=[self.timeouts.get(name) for name in names], default=[])
+        return _fuse(ranked, self.rrf_k, self.k, lambda doc: (doc.metadata['index_name'], *_doc_key(doc)))
+
+    async def _aget_relevant_documents(self, query: str, *,
+                                       run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        return await asyncio.to_thread(self._get_relevant_documents, query, run_manager=run_manager.get_sync())
+
+def _fuse(ranked: List[List[Document]], rrf_k: int, k: int, key: Callable[[Document], tuple]) -> List[Document]:
+    """ Reciprocal rank fusion: each chunk scores `sum(1 / (rrf_k + rank))` over the lists it is in. """
+    scores: Dict[tuple, float] = {}
+    docs: Dict[tuple, Document] = {}
+    for results in ranked:
+        for rank, doc in enumerate(results, start=1):
+            doc_key = key(doc)
+            scores[doc_key] = scores.get(doc_key, 0.0) + 1.0 / (rrf_k + rank)
+            docs.setdefault(doc_key, doc)
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [docs[doc_key] for doc_key in best]
+
+def _doc_key(doc: Document) -> tuple:
+    if 'source' in doc.metadata and 'chunk_id' in doc.metadata:
+        return doc.metadata['source'], float(doc.metadata['chunk_id'])
+    return (doc.id or doc.page_content,)
+
+def build_retriever(index_name: str, vector_store: VectorStore, config: Optional[dict] = None) -> BaseRetriever:
+    """
+    Build an agent's retriever from its `retriever` block in `config/agents.yaml`:
+
+        retriever:
+          type: hybrid      # `vector` (default) or `hybrid` (vector + BM25, fused by reciprocal rank)
+          k: 3              # chunks returned
+          fetch_k: 10       # hybrid only, candidates taken from each side
+          rrf_k: 60         # hybrid only, rank-fusion constant
+
+    The hybrid retriever reads the lexical index built by ingestion for the same index name.
+    `federated` searches several indexes (see FederatedRetriever); the agent's own index is reused
+    and the others are built from their `vector_store` blocks:
+
+        retriever:
+          type: federated
+          k: 5
+          fetch_k: 10       # candidates taken from each index
+          rrf_k: 60         # rank-fusion constant
+          indexes:
+            - index_name: omniverse-index
+              timeout: 5.0
+            - index_name: vector-vault-1
+              vector_store: {backend: pinecone, namespace: books}
+    """
+    config = dict(config or {})
+    kind = config.pop('type', 'vector')
+    k = config.pop('k', 3)
+    if kind == 'vector':
+        return vector_store.as_retriever(search_kwargs={"k": k})
+    if kind == 'hybrid':
+        return HybridRetriever(vector_store=vector_store, lexical_index=get_lexical_index(index_name), k=k, **config)
+    if kind == 'federated':
+        vector_stores, timeouts = {}, {}
+        for member in config.pop('indexes'):
+            name = member['index_name']
+            vector_stores[name] = vector_store if name == index_name else build_vector_store(
+                name, vector_store.embeddings, member.get('vector_store'))
+            timeouts[name] = member.get('timeout', 10.0)
+        return FederatedRetriever(vector_stores=vector_stores, timeouts=timeouts, k=k, **config)
+    raise ValueError(f"Retriever type '{kind}' is not supported.")
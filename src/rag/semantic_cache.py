@@ -0,0 +1,113 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from config import SEMANTIC_CACHE
+
+class SemanticCache:
+    """
+    Answer cache keyed by query meaning rather than exact text.
+
+    Each entry stores the normalized query embedding and the final answer. A lookup returns the
+    answer of the most similar stored query when its cosine similarity is at least `threshold`.
+    Entries are partitioned by a `scope` (agent, index and recent history) and by the version of the
+    index they were answered from; `invalidate_index` bumps that version so answers built on stale
+    documents are never served.
+    """
+    def __init__(self, path: str, max_entries_per_scope: int = 1000, ttl_seconds: float = None):
+        self.path = path
+        self.max_entries_per_scope = max_entries_per_scope
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, scope TEXT NOT NULL, index_name TEXT NOT NULL, '
+            'index_version INTEGER NOT NULL, query TEXT NOT NULL, embedding BLOB NOT NULL, '
+            'answer TEXT NOT NULL, created_at REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS entries_scope ON entries (scope, index_name, index_version)')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS index_versions (index_name TEXT PRIMARY KEY, version INTEGER NOT NULL)'
+        )
+        self._conn.commit()
+
+    def index_version(self, index_name: str) -> int:
+        with self._lock:
+            return self._index_version(index_name)
+
+    def _index_version(self, index_name: str) -> int:
+        row = self._conn.execute('SELECT version FROM index_versions WHERE index_name = ?', (index_name,)).fetchone()
+        return row[0] if row else 0
+
+    def invalidate_index(self, index_name: str) -> int:
+        """
+        Invalidation hook for ingestion: bump the index version and drop answers from older versions.
+        """
+        with self._lock:
+            version = self._index_version(index_name) + 1
+            self._conn.execute(
+                'INSERT OR REPLACE INTO index_versions (index_name, version) VALUES (?, ?)', (index_name, version)
+            )
+            self._conn.execute('DELETE FROM entries WHERE index_name = ? AND index_version < ?', (index_name, version))
+            self._conn.commit()
+        return version
+
+    def lookup(self, embedding: List[float], scope: str, index_name: str, threshold: float) -> Optional[str]:
+        with self._lock:
+            version = self._index_version(index_name)
+            params = [scope, index_name, version]
+            query = 'SELECT embedding, answer FROM entries WHERE scope = ? AND index_name = ? AND index_version = ?'
+            if self.ttl_seconds is not None:
+                query += ' AND created_at >= ?'
+                params.append(time.time() - self.ttl_seconds)
+            rows = self._conn.execute(query, params).fetchall()
+        if not rows:
+            return None
+
+        matrix = np.stack([np.frombuffer(blob, dtype=np.float32) for blob, _ in rows])
+        scores = matrix @ self._normalize(embedding)
+        best = int(np.argmax(scores))
+        if scores[best] >= threshold:
+            return rows[best][1]
+        return None
+
+    def update(self, query: str, embedding: List[float], answer: str, scope: str, index_name: str):
+        blob = self._normalize(embedding).tobytes()
+        with self._lock:
+            version = self._index_version(index_name)
+            self._conn.execute(
+                'INSERT INTO entries (scope, index_name, index_version, query, embedding, answer, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (scope, index_name, version, query, blob, answer, time.time()),
+            )
+            # Keep only the newest entries for the scope
+            self._conn.execute(
+                'DELETE FROM entries WHERE scope = ? AND index_name = ? AND id NOT IN ('
+                'SELECT id FROM entries WHERE scope = ? AND index_name = ? ORDER BY id DESC LIMIT ?)',
+                (scope, index_name, scope, index_name, self.max_entries_per_scope),
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+_semantic_cache = None
+_semantic_cache_lock = threading.Lock()
+
+def get_semantic_cache() -> SemanticCache:
+    """ Return the process-wide semantic cache configured by `SEMANTIC_CACHE` in config.py. """
+    global _semantic_cache
+    with _semantic_cache_lock:
+        if _semantic_cache is None:
+            _semantic_cache = SemanticCache(**SEMANTIC_CACHE)
+    return _semantic_cache
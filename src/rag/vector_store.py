@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import uuid
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import typer
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from langchain_pinecone import PineconeVectorStore
+from pinecone.exceptions import PineconeApiException
+
+from config import VECTOR_STORE_DIR
+from src.rag.local_store import LocalVectorStore
+from src.utils.single_flight import single_flight
+
+# Separator between source and chunk_id in record IDs written by ingestion: "<source>#<chunk_id>"
+ID_SEPARATOR = '#'
+
+class PineconeStore(PineconeVectorStore):
+    """
+    PineconeVectorStore with retrieval paths that do not embed a query.
+
+    - `fetch_by_ids`: fetch records by ID.
+    - `list_ids`: page through record IDs by prefix (serverless indexes).
+    - `fetch_by_metadata`: filter-only lookup. Queries with a fixed placeholder vector instead of an
+      embedding, and pages past Pinecone's per-query limit by ascending ranges of `page_key`.
+    - `fetch_source`: every chunk of a source, via ID prefix when available, otherwise by metadata.
+    - `add_embeddings`: upsert records with precomputed embeddings (used by ingestion).
+    - Identical concurrent vector queries (same index, namespace, vector, k and filter) share one request.
+    """
+    FETCH_BATCH_SIZE = 100
+    UPSERT_BATCH_SIZE = 100
+    MAX_QUERY_PAGE_SIZE = 1000  # Pinecone's top_k limit when metadata is included
+    LIST_UNSUPPORTED_STATUSES = (400, 404)  # `list` on a pod-based index or a missing namespace
+
+    def __init__(self, *args, index_name: str = None, **kwargs):
+        super().__init__(*args, index_name=index_name, **kwargs)
+        self.index_name = index_name
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], *, k: int = 4, filter: Optional[dict] = None,
+                                               namespace: Optional[str] = None) -> List[Tuple[Document, float]]:
+        key = (
+            'pinecone-query', self.index_name or id(self._index), namespace or self._namespace, k,
+            json.dumps(filter, sort_keys=True, default=str),
+            hashlib.sha256(np.asarray(embedding, dtype=np.float32).tobytes()).hexdigest(),
+        )
+        search = super().similarity_search_by_vector_with_score
+        results = single_flight.do(key, lambda: search(embedding, k=k, filter=filter, namespace=namespace))
+        # Every caller gets its own documents, since retrievers may annotate their metadata
+        return [(Document(id=doc.id, page_content=doc.page_content, metadata=dict(doc.metadata)), score)
+                for doc, score in results]
+
+    def add_embeddings(self, texts: List[str], embeddings: Sequence[Sequence[float]],
+                       metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None) -> List[str]:
+        """ Insert or replace records with precomputed embeddings. """
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        vectors = [
+            (record_id, list(embedding), {**metadata, self._text_key: text})
+            for record_id, text, embedding, metadata in zip(ids, texts, embeddings, metadatas)
+        ]
+        for start in range(0, len(vectors), self.UPSERT_BATCH_SIZE):
+            self._index.upsert(vectors=vectors[start:start + self.UPSERT_BATCH_SIZE], namespace=self._namespace)
+        return list(ids)
+
+    def fetch_by_ids(self, ids: List[str]) -> List[Document]:
+        docs = []
+        for start in range(0, len(ids), self.FETCH_BATCH_SIZE):
+            batch = ids[start:start + self.FETCH_BATCH_SIZE]
+            response = self._index.fetch(ids=batch, namespace=self._namespace)
+            for record_id in batch:
+                record = response.vectors.get(record_id)
+                if record is not None:
+                    docs.append(self._to_document(record_id, record.metadata))
+        return docs
+
+    def list_ids(self, prefix: str = None) -> Iterator[str]:
+        for page in self._index.list(prefix=prefix, namespace=self._namespace):
+            yield from page
+
+    def fetch_by_metadata(self, filter: dict, page_key: str = 'chunk_id', page_size: int = 500,
+                          max_records: Optional[int] = None) -> List[Document]:
+        """
+        Every record matching `filter`. A query returns at most `page_size` matches in no particular
+        order, so larger results are read in ascending windows `cursor < page_key <= cursor + span` of
+        the numeric, non-negative `page_key`. A window is only taken once it fits in one page; the
+        span halves when it does not and doubles while windows come back sparse.
+        """
+        page_size = min(page_size, self.MAX_QUERY_PAGE_SIZE)
+        docs, cursor, span = [], None, float(page_size)
+        while max_records is None or len(docs) < max_records:
+            rest = self._query_metadata(self._page_filter(filter, page_key, cursor), page_size)
+            if len(rest) < page_size:
+                return docs + rest
+            if cursor is None and any(doc.metadata.get(page_key) is None for doc in rest):
+                typer.secho(f"Records missing '{page_key}' cannot be paged; results for {filter} may be incomplete.",
+                            fg=typer.colors.YELLOW)
+                return rest
+            cursor = -1.0 if cursor is None else cursor
+            while True:
+                window = self._query_metadata(self._page_filter(filter, page_key, cursor, cursor + span), page_size)
+                if len(window) < page_size:
+                    break
+                if span <= 1e-3:
+                    typer.secho(f"Too many records share a '{page_key}' to page; results for {filter} may be "
+                                f"incomplete.", fg=typer.colors.YELLOW)
+                    return docs + window
+                span /= 2
+            docs.extend(window)
+            cursor += span
+            if len(window) < page_size // 2:
+                span *= 2
+        typer.secho(f"Metadata fetch for {filter} stopped at max_records={max_records}; results are truncated.",
+                    fg=typer.colors.YELLOW)
+        return docs[:max_records]
+
+    def _query_metadata(self, filter: dict, page_size: int) -> List[Document]:
+        response = self._index.query(
+            vector=self._placeholder_vector(),
+            top_k=page_size,
+            filter=filter,
+            include_metadata=True,
+            namespace=self._namespace,
+        )
+        return [self._to_document(match.id, match.metadata) for match in response.matches]
+
+    @staticmethod
+    def _page_filter(filter: dict, page_key: str, cursor: Optional[float], upper: Optional[float] = None) -> dict:
+        """ `filter` narrowed to `cursor < page_key <= upper` (unbounded where None). """
+        bounds = {}
+        if cursor is not None:
+            bounds['$gt'] = cursor
+        if upper is not None:
+            bounds['$lte'] = upper
+        return {'$and': [filter, {page_key: bounds}]} if bounds else filter
+
+    def fetch_source(self, source: str, max_records: Optional[int] = None) -> List[Document]:
+        """ Return every chunk of `source`, ordered by chunk_id. """
+        docs = []
+        try:
+            ids = list(self.list_ids(prefix=f'{source}{ID_SEPARATOR}'))
+            docs = self.fetch_by_ids(ids[:max_records] if max_records else ids)
+        except PineconeApiException as e:
+            # ID listing is only available on serverless indexes; pod-based indexes reject it (400)
+            if e.status not in self.LIST_UNSUPPORTED_STATUSES:
+                raise
+            typer.secho(f"ID listing unavailable on '{self.index_name}' ({e.status}); fetching '{source}' by metadata.",
+                        fg=typer.colors.YELLOW)
+        if not docs:
+            docs = self.fetch_by_metadata({'source': {'$eq': source}}, max_records=max_records)
+        return sorted(docs, key=lambda doc: float(doc.metadata.get('chunk_id', 0)))
+
+    def _placeholder_vector(self) -> List[float]:
+        if not hasattr(self, '_dimension'):
+            self._dimension = self._index.describe_index_stats()['dimension']
+        return [1.0] + [0.0] * (self._dimension - 1)
+
+    def _to_document(self, record_id: str, metadata: dict) -> Document:
+        metadata = dict(metadata or {})
+        text = metadata.pop(self._text_key, '')
+        return Document(id=record_id, page_content=text, metadata=metadata)
+
+def build_vector_store(index_name: str, embeddings: Embeddings, config: Optional[dict] = None) -> VectorStore:
+    """
+    Build the vector store for an agent from its `vector_store` block in `config/agents.yaml`:
+
+        vector_store:
+          backend: local                 # `pinecone` (default) or `local`
+          path: data/vector_store/...    # local only, defaults to VECTOR_STORE_DIR/<index_name>
+          n_lists: 256                   # local only, enables the approximate (IVF) index
+          quantization: int8             # local only, `float16` (default), `int8` or null for float32 scans
+          rescore_factor: 4              # local only, candidates per result rescored at full precision
+          namespace: docs                # pinecone only, namespace to read and write
+
+    Both backends expose the same retriever and metadata-only fetch interface.
+    """
+    config = dict(config or {})
+    backend = config.pop('backend', 'pinecone')
+    if backend == 'pinecone':
+        return PineconeStore(index_name=index_name, embedding=embeddings, **config)
+    if backend == 'local':
+        path = config.pop('path', os.path.join(VECTOR_STORE_DIR, index_name))
+        return LocalVectorStore(embeddings, path=path, **config)
+    raise ValueError(f"Vector store backend '{backend}' is not supported.")
@@ -0,0 +1,70 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Coroutine, Iterable, List, Sequence, Union
+
+import typer
+
+# Bounded pool shared by blocking I/O fan-outs (vector store fetches, etc.)
+IO_MAX_WORKERS = 16
+_io_executor = ThreadPoolExecutor(max_workers=IO_MAX_WORKERS, thread_name_prefix='agent-io')
+
+class EventLoopRunner:
+    """
+    Process-wide asyncio event loop running on a daemon thread.
+
+    Streamlit gives every session its own script thread. Agents submit their coroutines here so
+    that network waits are multiplexed on a single loop, and async clients (httpx pools, etc.)
+    stay bound to one long-lived loop instead of a new loop per turn.
+    """
+    _loop: asyncio.AbstractEventLoop = None
+    _thread: threading.Thread = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_loop(cls) -> asyncio.AbstractEventLoop:
+        with cls._lock:
+            if cls._loop is None or cls._loop.is_closed():
+                cls._loop = asyncio.new_event_loop()
+                cls._thread = threading.Thread(target=cls._loop.run_forever, name='agent-event-loop', daemon=True)
+                cls._thread.start()
+        return cls._loop
+
+    @classmethod
+    def submit(cls, coro: Coroutine) -> Future:
+        """ Schedule a coroutine on the shared loop and return a concurrent Future. """
+        return asyncio.run_coroutine_threadsafe(coro, cls.get_loop())
+
+def run_coroutine(coro: Coroutine, timeout: float = None) -> Any:
+    """
+    Run a coroutine on the shared event loop and block the calling (script) thread until it completes.
+    """
+    return EventLoopRunner.submit(coro).result(timeout=timeout)
+
+def thread_map(fn: Callable, items: Iterable, timeout: Union[float, Sequence[float]] = None,
+               default: Any = None) -> List[Any]:
+    """
+    Call `fn` on every item concurrently on the shared I/O pool and return the results in input order.
+
+    Each call gets `timeout` seconds (or its own entry of a per-item sequence) from the moment the
+    fan-out starts; a call that times out or raises yields `default` instead, so one slow item
+    cannot stall the caller.
+    """
+    items = list(items)
+    timeouts = list(timeout) if isinstance(timeout, (list, tuple)) else [timeout] * len(items)
+    futures = [_io_executor.submit(fn, item) for item in items]
+    start = time.monotonic()
+    results = []
+    for item, future, item_timeout in zip(items, futures, timeouts):
+        remaining = None if item_timeout is None else max(0.0, start + item_timeout - time.monotonic())
+        try:
+            results.append(future.result(timeout=remaining))
+        except FutureTimeoutError:
+            future.cancel()
+            typer.secho(f'{getattr(fn, "__name__", fn)}({item!r}) timed out after {item_timeout}s', fg=typer.colors.YELLOW)
+            results.append(default)
+        except Exception as e:
+            typer.secho(f'{getattr(fn, "__name__", fn)}({item!r}) failed: {e}', fg=typer.colors.RED)
+            results.append(default)
+    return results
@@ -0,0 +1,68 @@
+from langchain.memory import ConversationBufferMemory
+from langchain_core.messages import BaseMessage
+
+from src.utils.tokens import count_tokens
+
+# Approximate per-message overhead of the chat format (role and separators)
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+class HistoryWindow:
+    """
+    Sliding-window view over the shared conversation memory, bounded by a token budget.
+
+    The most recent messages are kept verbatim, newest first, until the budget is spent; older
+    messages are dropped. The latest message is always kept. Token counts are cached per message
+    in `token_cache` (parallel to the message list, like MemoryHandler.info_cache) and only
+    recounted when a message's content changes, e.g. while it is being streamed.
+
+    Exposes `load_memory_variables` so it can stand in for ConversationBufferMemory in chains.
+    """
+    def __init__(self, memory_cache: ConversationBufferMemory, max_tokens: int, model: str = None):
+        self.memory_cache = memory_cache
+        self.max_tokens = max_tokens
+        self.model = model
+        self.token_cache = []  # (content hash, token count) per message
+
+    def load_memory_variables(self, inputs: dict = None) -> dict:
+        return {'history': self.load_messages()}
+
+    def load_messages(self) -> list:
+        messages = self.memory_cache.chat_memory.messages
+        if self.max_tokens is None:
+            return list(messages)
+
+        counts = self._token_counts(messages)
+        budget = self.max_tokens
+        start = len(messages)
+        while start > 0:
+            cost = counts[start - 1]
+            if cost > budget and start < len(messages):
+                break
+            budget -= cost
+            start -= 1
+        return messages[start:]
+
+    def _token_counts(self, messages: list) -> list:
+        if len(self.token_cache) > len(messages):
+            # Memory was cleared or replaced; start over
+            self.token_cache = []
+        counts = []
+        for idx, message in enumerate(messages):
+            content = self._content_text(message)
+            key = hash(content)
+            if idx < len(self.token_cache) and self.token_cache[idx][0] == key:
+                counts.append(self.token_cache[idx][1])
+                continue
+            count = count_tokens(content, self.model) + _MESSAGE_OVERHEAD_TOKENS
+            if idx < len(self.token_cache):
+                self.token_cache[idx] = (key, count)
+            else:
+                self.token_cache.append((key, count))
+            counts.append(count)
+        return counts
+
+    @staticmethod
+    def _content_text(message: BaseMessage) -> str:
+        if isinstance(message.content, str):
+            return message.content
+        return str(message.content)
@@ -1,5 +1,66 @@
+import io
 import streamlit as st
 from langchain.memory import ConversationBufferMemory
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
+
+class StreamingMessageBuilder:
+    """
+    Append-only buffer for a message that is being streamed.
+
+    Text is written to a running buffer and only copied into `message.content` when the message is
+    materialized, so appending a token does not copy the whole string. `text` reads the buffer for
+    rendering without materializing.
+    """
+    def __init__(self, message: BaseMessage):
+        self.message = message
+        self._buffer = io.StringIO()
+        self._buffer.write(message.content)
+        self._dirty = False
+
+    def append(self, text: str):
+        self._buffer.write(text)
+        self._dirty = True
+
+    @property
+    def text(self) -> str:
+        return self._buffer.getvalue()
+
+    def materialize(self) -> BaseMessage:
+        if self._dirty:
+            self.message.content = self._buffer.getvalue()
+            self._dirty = False
+        return self.message
+
+class MemoryOverlay:
+    """
+    Copy-on-write view of a parent ConversationBufferMemory.
+
+    The parent's messages are shared, not copied; messages added through the overlay are kept in
+    `own_messages` and appended after the parent's when read. Creating an overlay is O(1)
+    regardless of the length of the conversation.
+    """
+    def __init__(self, parent: ConversationBufferMemory):
+        self.parent = parent
+        self.own_messages = []
+
+    @property
+    def messages(self) -> list:
+        if not self.own_messages:
+            return list(self.parent.chat_memory.messages)
+        return self.parent.chat_memory.messages + self.own_messages
+
+    def add_user_message(self, message: str):
+        self.own_messages.append(HumanMessage(content=message))
+
+    def add_ai_message(self, message: str):
+        self.own_messages.append(AIMessage(content=message))
+
+    def load_memory_variables(self, inputs: dict = None) -> dict:
+        return {'history': self.messages}
+
+    def clear(self):
+        """ Drop the overlay's own messages. The parent memory is never modified. """
+        self.own_messages = []
 
 class MemoryHandler:
     """
@@ -13,36 +74,66 @@ class MemoryHandler:
     def __init__(self, memory_cache: ConversationBufferMemory):
         self.memory_cache = memory_cache
         self.info_cache = []
+        self._builder = None
         if len(self.memory_cache.chat_memory.messages) > 0:
             for _ in range(len(self.memory_cache.chat_memory.messages)):
                 self.info_cache.append({})
 
     def __iter__(self):
+        self.materialize()
         return zip(self.memory_cache.chat_memory.messages, self.info_cache)
     
     def __len__(self):
         return len(self.memory_cache.chat_memory.messages)
     
     def __getitem__(self, index):
+        self.materialize()
         return self.memory_cache.chat_memory.messages[index], self.info_cache[index]
 
     def add_user_message(self, message: str, info: dict = {}):
+        self.materialize()
         self.memory_cache.chat_memory.add_user_message(message)
         self.info_cache.append(info)
 
     def add_ai_message(self, message: str, info: dict = {}):
+        self.materialize()
         self.memory_cache.chat_memory.add_ai_message(message)
         self.info_cache.append(info)
 
     def update_last_message(self, message: str, info: dict = {}):
+        self._builder = None
         self.memory_cache.chat_memory.messages[-1].content = message
         self.info_cache[-1] = info
 
     def append_last_message(self, message: str):
         """
         Append text to the content of the last message in the chat history.
+
+        Text is buffered by a StreamingMessageBuilder; `content` is only rebuilt when the message is
+        read through this handler or `materialize` is called (e.g. at the end of a stream).
+        """
+        last_message = self.memory_cache.chat_memory.messages[-1]
+        if self._builder is None or self._builder.message is not last_message:
+            self.materialize()
+            self._builder = StreamingMessageBuilder(last_message)
+        self._builder.append(message)
+
+    def streaming_text(self) -> str:
+        """
+        Text of the last message including buffered chunks, without materializing it (for rendering
+        while a stream is in progress).
+        """
+        last_message = self.memory_cache.chat_memory.messages[-1]
+        if self._builder is not None and self._builder.message is last_message:
+            return self._builder.text
+        return last_message.content
+
+    def materialize(self):
+        """
+        Join any buffered chunks into the content of the message being streamed.
         """
-        self.memory_cache.chat_memory.messages[-1].content += message
+        if self._builder is not None:
+            self._builder.materialize()
 
     def update_last_info(self, info: dict):
         """
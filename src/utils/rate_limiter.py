@@ -0,0 +1,253 @@
+import asyncio
+import contextlib
+import threading
+import time
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Coroutine, Deque, Dict, Iterator, Optional
+
+from config import LLM_RATE_LIMITS
+
+# Session that issued the current LLM call; set when an agent coroutine is submitted (see `with_session`)
+session_id: ContextVar[str] = ContextVar('session_id', default='default')
+
+async def with_session(coro: Coroutine, session: Optional[str]) -> Any:
+    """ Run `coro` with `session_id` set, so LLM calls it makes are queued under that session. """
+    if session is not None:
+        session_id.set(session)
+    return await coro
+
+class TokenBucket:
+    """ Bucket holding at most `per_minute` units, refilled continuously at `per_minute` per minute. """
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.level = self.capacity
+        self.rate = self.capacity / 60.0
+        self._updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, amount: float) -> float:
+        """ Seconds until `amount` units are available (0 if they are available now). """
+        self.refill()
+        return max(0.0, (min(amount, self.capacity) - self.level) / self.rate)
+
+    def take(self, amount: float):
+        # A request larger than the bucket drains it instead of waiting forever
+        self.level -= min(amount, self.capacity)
+
+    def give(self, amount: float):
+        self.level = min(self.capacity, self.level + amount)
+
+class _Waiter:
+    """ A queued call; woken from whichever thread admits it. """
+    def __init__(self, tokens: int, loop: asyncio.AbstractEventLoop = None):
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+        self.granted = False
+        self.loop = loop
+        self.future = loop.create_future() if loop else None
+        self.event = None if loop else threading.Event()
+
+    def grant(self):
+        self.granted = True
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+class AdmissionController:
+    """
+    Admission control for the LLM calls of one model, shared by every session in the process.
+
+    A call is admitted when fewer than `max_concurrency` calls are in flight and both token buckets
+    (requests per minute and tokens per minute) can cover it. The token cost is estimated up front
+    from the prompt plus the expected completion (`completion_tokens` unless the call sets a
+    `max_tokens`), and corrected with the actual count on release.
+    Waiting calls are queued per session and admitted round-robin across sessions, so one busy
+    session cannot starve the others. A call that is not admitted within `acquire_timeout` seconds
+    leaves the queue and raises TimeoutError.
+    """
+    def __init__(self, model: str, max_concurrency: int, rpm: int, tpm: int, completion_tokens: int = 512,
+                 acquire_timeout: Optional[float] = None):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.completion_tokens = completion_tokens
+        self.acquire_timeout = acquire_timeout
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.active = 0
+        self.admitted = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._queues: Dict[str, Deque[_Waiter]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._timer: threading.Timer = None
+
+    def acquire(self, tokens: int, session: str = None):
+        waiter = self._enqueue(_Waiter(tokens), session)
+        if waiter.event.wait(self.acquire_timeout):
+            return
+        with self._lock:
+            if waiter.granted:
+                # Admitted just as the wait ran out
+                return
+            self._remove(waiter)
+        raise self._timed_out()
+
+    async def aacquire(self, tokens: int, session: str = None):
+        waiter = self._enqueue(_Waiter(tokens, asyncio.get_running_loop()), session)
+        try:
+            await asyncio.wait_for(waiter.future, self.acquire_timeout)
+        except (asyncio.CancelledError, TimeoutError) as e:
+            with self._lock:
+                granted = waiter.granted
+                if not granted:
+                    self._remove(waiter)
+            if isinstance(e, TimeoutError):
+                if granted:
+                    return
+                raise self._timed_out() from None
+            if granted:
+                self.release(tokens)
+            raise
+
+    def release(self, estimated: int, actual: Optional[int] = None):
+        """ Free a concurrency slot and settle the difference between estimated and actual tokens. """
+        with self._lock:
+            self.active -= 1
+            if actual is not None:
+                self.tokens.refill()
+                self.tokens.give(estimated - actual)
+            self._dispatch()
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            waiting = [waiter for queue in self._queues.values() for waiter in queue]
+            return {
+                'model': self.model,
+                'active': self.active,
+                'queued': len(waiting),
+                'sessions_queued': len(self._queues),
+                'admitted': self.admitted,
+                'avg_wait_s': self.total_wait / self.admitted if self.admitted else 0.0,
+                'max_wait_s': self.max_wait,
+                'oldest_wait_s': max((now - waiter.enqueued for waiter in waiting), default=0.0),
+            }
+
+    def _timed_out(self) -> TimeoutError:
+        return TimeoutError(f'{self.model}: call not admitted within {self.acquire_timeout}s')
+
+    def _enqueue(self, waiter: _Waiter, session: Optional[str]) -> _Waiter:
+        with self._lock:
+            self._queues.setdefault(session or session_id.get(), deque()).append(waiter)
+            self._dispatch()
+        return waiter
+
+    def _remove(self, waiter: _Waiter):
+        for session, queue in self._queues.items():
+            if waiter in queue:
+                queue.remove(waiter)
+                if not queue:
+                    del self._queues[session]
+                return
+
+    def _dispatch(self):
+        """ Admit queued calls round-robin across sessions while capacity allows. Called with the lock held. """
+        while self._queues and self.active < self.max_concurrency:
+            session, queue = next(iter(self._queues.items()))
+            waiter = queue[0]
+            delay = max(self.requests.delay(1), self.tokens.delay(waiter.tokens))
+            if delay > 0:
+                self._schedule(delay)
+                return
+            queue.popleft()
+            del self._queues[session]
+            if queue:
+                # The session goes to the back of the line for its next call
+                self._queues[session] = queue
+            self.requests.take(1)
+            self.tokens.take(waiter.tokens)
+            self.active += 1
+            wait = time.monotonic() - waiter.enqueued
+            self.admitted += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            waiter.grant()
+
+    def _schedule(self, delay: float):
+        if self._timer is not None and self._timer.is_alive():
+            return
+        self._timer = threading.Timer(delay, self._redispatch)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _redispatch(self):
+        with self._lock:
+            self._timer = None
+            self._dispatch()
+
+    # Call wrappers
+    # ------------
+    def limit_stream(self, chunks: Callable[[], Iterator[Any]], prompt_tokens: int, completion_tokens: int,
+                     count: Callable[[Any], int], session: str = None) -> Iterator[Any]:
+        """
+        Wait for admission, then yield from `chunks()` while holding the slot. `count(chunk)` returns
+        the completion tokens in a chunk; the total settles the estimate on release. Closing this
+        generator closes `chunks()` and releases the slot right away.
+        """
+        estimated = prompt_tokens + completion_tokens
+        self.acquire(estimated, session)
+        used = 0
+        try:
+            with contextlib.closing(chunks()) as upstream:
+                for chunk in upstream:
+                    used += count(chunk)
+                    yield chunk
+        finally:
+            self.release(estimated, prompt_tokens + used)
+
+    async def alimit_stream(self, chunks: Callable[[], AsyncIterator[Any]], prompt_tokens: int,
+                            completion_tokens: int, count: Callable[[Any], int],
+                            session: str = None) -> AsyncIterator[Any]:
+        estimated = prompt_tokens + completion_tokens
+        await self.aacquire(estimated, session)
+        used = 0
+        try:
+            async with contextlib.aclosing(chunks()) as upstream:
+                async for chunk in upstream:
+                    used += count(chunk)
+                    yield chunk
+        finally:
+            self.release(estimated, prompt_tokens + used)
+
+_controllers: Dict[str, AdmissionController] = {}
+_controllers_lock = threading.Lock()
+
+def get_admission_controller(model: str) -> AdmissionController:
+    """ Return the process-wide controller for `model`, configured from `LLM_RATE_LIMITS` in config.py. """
+    controller = _controllers.get(model)
+    if controller is None:
+        with _controllers_lock:
+            controller = _controllers.get(model)
+            if controller is None:
+                limits = {**LLM_RATE_LIMITS['default'], **LLM_RATE_LIMITS.get(model, {})}
+                controller = _controllers[model] = AdmissionController(
+                    model, limits['max_concurrency'], limits['rpm'], limits['tpm'], limits['completion_tokens'],
+                    limits['acquire_timeout'],
+                )
+    return controller
+
+def admission_stats() -> list:
+    """ Queue depth and wait-time figures for every model that has been called. """
+    with _controllers_lock:
+        controllers = list(_controllers.values())
+    return [controller.stats() for controller in controllers]
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional, Sequence
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.outputs import Generation
+
+from config import RESPONSE_CACHE
+
+class SQLiteResponseCache(BaseCache):
+    """
+    Persistent exact-match cache for LLM responses.
+
+    Entries are keyed by a hash of the rendered prompt and the LLM string (model name and sampling
+    parameters), which LangChain passes to `lookup`/`update`. Entries expire after `ttl_seconds`
+    and the least recently used entries are evicted once `max_entries` or `max_bytes` is exceeded.
+    The database runs in WAL mode so several Streamlit worker processes can share one file.
+    """
+    def __init__(self, path: str, ttl_seconds: float = None, max_entries: int = None, max_bytes: int = None):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, '
+            'created_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)')
+        self._conn.commit()
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f'{llm_string}\0{prompt}'.encode('utf-8')).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute('SELECT value, created_at FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+            self._conn.commit()
+        return [loads(gen) for gen in json.loads(value)]
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        key = self._key(prompt, llm_string)
+        value = json.dumps([dumps(gen) for gen in return_val])
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)',
+                (key, value, len(value), now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._conn.execute('DELETE FROM responses')
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        """ Drop expired entries, then least recently used entries until within the size limits. """
+        if self.ttl_seconds is not None:
+            self._conn.execute('DELETE FROM responses WHERE created_at < ?', (now - self.ttl_seconds,))
+        if self.max_entries is not None:
+            self._conn.execute(
+                'DELETE FROM responses WHERE key IN ('
+                'SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,),
+            )
+        if self.max_bytes is not None:
+            total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+            if total > self.max_bytes:
+                rows = self._conn.execute('SELECT key, size FROM responses ORDER BY accessed_at ASC').fetchall()
+                stale = []
+                for key, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    stale.append((key,))
+                    total -= size
+                self._conn.executemany('DELETE FROM responses WHERE key = ?', stale)
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache() -> SQLiteResponseCache:
+    """ Return the process-wide response cache configured by `RESPONSE_CACHE` in config.py. """
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = SQLiteResponseCache(**RESPONSE_CACHE)
+    return _response_cache
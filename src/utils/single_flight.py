@@ -0,0 +1,228 @@
+import asyncio
+import contextlib
+import threading
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Iterator, List
+
+class SingleFlight:
+    """
+    Collapses concurrent identical calls into one.
+
+    The first caller for a key starts the call; callers arriving with the same key while it is in
+    flight wait for it and receive the same result (or exception). Nothing is kept after the call
+    finishes, so this is deduplication, not caching.
+
+    - `do` / `ado`: one result, for sync callers and coroutines on the shared event loop. `ado` runs
+      the call as its own task, so cancelling any one caller (the first included) does not cancel
+      it for the others; it is cancelled once every caller has been cancelled.
+    - `stream` / `astream`: an iterator of items. The upstream iterator is consumed by a background
+      pump, and every subscriber sees all items from the start, including items produced before it
+      joined. A subscriber that stops early does not stop the stream for the others; once the last
+      one leaves, the pump stops and closes the upstream iterator.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self._async_calls: Dict[Hashable, '_AsyncCall'] = {}
+        self._streams: Dict[Hashable, '_Broadcast'] = {}
+        self._async_streams: Dict[Hashable, '_AsyncBroadcast'] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        # Async flights live on one event loop; the loop is part of the key
+        key = (asyncio.get_running_loop(), key)
+        call = self._async_calls.get(key)
+        if call is None:
+            call = self._async_calls[key] = _AsyncCall(asyncio.ensure_future(fn()))
+            call.task.add_done_callback(lambda _: self._end_async_call(key, call))
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.task.done():
+                # The last caller left: cancel the call and let the next caller start afresh
+                if self._async_calls.get(key) is call:
+                    del self._async_calls[key]
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    def stream(self, key: Hashable, fn: Callable[[], Iterator[Any]]) -> Iterator[Any]:
+        with self._lock:
+            broadcast = self._streams.get(key)
+            if broadcast is None:
+                broadcast = self._streams[key] = _Broadcast()
+                threading.Thread(target=broadcast.pump, args=(fn, lambda: self._end_stream(key, broadcast)),
+                                 name='single-flight-stream', daemon=True).start()
+            broadcast.subscribers += 1
+        try:
+            yield from broadcast.subscribe()
+        finally:
+            self._leave_stream(key, broadcast)
+
+    async def astream(self, key: Hashable, fn: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        key = (asyncio.get_running_loop(), key)
+        broadcast = self._async_streams.get(key)
+        if broadcast is None:
+            broadcast = self._async_streams[key] = _AsyncBroadcast()
+            broadcast.task = asyncio.ensure_future(broadcast.pump(fn, lambda: self._end_async_stream(key, broadcast)))
+        broadcast.subscribers += 1
+        try:
+            async with contextlib.aclosing(broadcast.subscribe()) as items:
+                async for item in items:
+                    yield item
+        finally:
+            broadcast.subscribers -= 1
+            if not broadcast.subscribers and not broadcast.done:
+                # Nobody is listening any more: stop the upstream call and let the next caller start afresh
+                self._end_async_stream(key, broadcast)
+                broadcast.task.cancel()
+
+    def _end_async_call(self, key: Hashable, call: '_AsyncCall'):
+        if self._async_calls.get(key) is call:
+            del self._async_calls[key]
+        if not call.task.cancelled():
+            call.task.exception()  # Mark retrieved so a flight nobody awaits any more does not log a warning
+
+    def _end_stream(self, key: Hashable, broadcast: '_Broadcast'):
+        with self._lock:
+            if self._streams.get(key) is broadcast:
+                del self._streams[key]
+
+    def _leave_stream(self, key: Hashable, broadcast: '_Broadcast'):
+        with self._lock:
+            broadcast.subscribers -= 1
+            if broadcast.subscribers or broadcast.done:
+                return
+            broadcast.abandoned = True
+            if self._streams.get(key) is broadcast:
+                del self._streams[key]
+
+    def _end_async_stream(self, key: Hashable, broadcast: '_AsyncBroadcast'):
+        if self._async_streams.get(key) is broadcast:
+            del self._async_streams[key]
+
+class _AsyncCall:
+    """ One in-flight `ado` call and the number of callers awaiting it. """
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class _Broadcast:
+    """
+    Items of one upstream iterator, replayed to subscribers on any thread. `subscribers` is counted
+    under the SingleFlight lock; once it drops to zero the stream is `abandoned` and the pump stops
+    at the next item.
+    """
+    def __init__(self):
+        self.items: List[Any] = []
+        self.done = False
+        self.error: BaseException = None
+        self.subscribers = 0
+        self.abandoned = False
+        self._cond = threading.Condition()
+
+    def pump(self, fn: Callable[[], Iterator[Any]], on_done: Callable[[], None]):
+        try:
+            with _closing(fn()) as iterator:
+                for item in iterator:
+                    if self.abandoned:
+                        break
+                    with self._cond:
+                        self.items.append(item)
+                        self._cond.notify_all()
+        except BaseException as e:
+            self.error = e
+        finally:
+            on_done()
+            with self._cond:
+                self.done = True
+                self._cond.notify_all()
+
+    def subscribe(self) -> Iterator[Any]:
+        index = 0
+        while True:
+            with self._cond:
+                while index >= len(self.items) and not self.done:
+                    self._cond.wait()
+                pending = self.items[index:]
+                finished = self.done
+            for item in pending:
+                yield item
+            index += len(pending)
+            if finished and index >= len(self.items):
+                if self.error is not None:
+                    raise self.error
+                return
+
+class _AsyncBroadcast:
+    """
+    Items of one upstream async iterator, replayed to subscribers on the same event loop. The pump
+    task is cancelled once `subscribers` drops to zero.
+    """
+    def __init__(self):
+        self.items: List[Any] = []
+        self.done = False
+        self.error: BaseException = None
+        self.subscribers = 0
+        self.task: asyncio.Task = None
+        self._changed = asyncio.Event()
+
+    async def pump(self, fn: Callable[[], AsyncIterator[Any]], on_done: Callable[[], None]):
+        try:
+            async with _aclosing(fn()) as iterator:
+                async for item in iterator:
+                    self.items.append(item)
+                    self._notify()
+        except BaseException as e:
+            self.error = e
+        finally:
+            on_done()
+            self.done = True
+            self._notify()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        index = 0
+        while True:
+            changed = self._changed
+            while index < len(self.items):
+                yield self.items[index]
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+def _closing(iterator):
+    """ Close generators on exit; plain iterators have nothing to close. """
+    return contextlib.closing(iterator) if hasattr(iterator, 'close') else contextlib.nullcontext(iterator)
+
+def _aclosing(iterator):
+    return contextlib.aclosing(iterator) if hasattr(iterator, 'aclose') else contextlib.nullcontext(iterator)
+
+# Process-wide instance shared by the embedding, vector query and LLM wrappers
+single_flight = SingleFlight()
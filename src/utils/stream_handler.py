@@ -1,17 +1,34 @@
 from typing import Any, Callable, TypeVar
 from uuid import UUID
 import inspect
+import threading
+import time
 import streamlit as st
 from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from streamlit.runtime.scriptrunner_utils.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
 from langchain.callbacks.base import BaseCallbackHandler
+from langchain_core.callbacks.manager import AsyncCallbackManager
+from langchain_core.outputs import LLMResult, Generation
 from langchain_community.callbacks.streamlit import StreamlitCallbackHandler
-from src.app.ui_component import display_message, display_info
+from src.app.ui_component import display_info
 
 class StreamHandler(BaseCallbackHandler):
-    def __init__(self):
+    # Run inline on the event loop rather than in an executor so tokens render in order
+    run_inline = True
+
+    def __init__(self, flush_interval: float = 0.05, flush_tokens: int = 64):
+        """
+        Tokens are coalesced and rendered at most once per `flush_interval` seconds, or sooner once
+        `flush_tokens` tokens are pending. Whatever is left is flushed when the LLM run ends.
+        """
         # Initialize separate containers for tool output and LLM text
         self.tool_container = st.empty()
         self.llm_container = st.empty()
+        self.flush_interval = flush_interval
+        self.flush_tokens = flush_tokens
+        self._pending_tokens = []
+        self._last_flush = time.monotonic()
+        self._streamed_runs = set()
 
     def on_tool_end(self, output: Any, *, run_id: UUID, parent_run_id: UUID | None = None, **kwargs: Any) -> Any:
         """
@@ -30,18 +47,50 @@ class StreamHandler(BaseCallbackHandler):
         # Display the updated info in the tool container
         display_info(info, container=self.tool_container)
 
-    def on_llm_new_token(self, token: str, **kwargs):
-        st.session_state.memory_handler.append_last_message(token)
-        message, _ = st.session_state.memory_handler[-1]
+    def on_llm_new_token(self, token: str, *, run_id: UUID = None, **kwargs):
+        self._streamed_runs.add(run_id)
+        self._pending_tokens.append(token)
+        if (len(self._pending_tokens) >= self.flush_tokens
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID = None, **kwargs: Any) -> Any:
+        if run_id not in self._streamed_runs and response.generations and response.generations[0]:
+            # Cached responses end without streaming any tokens; replay the final text so the UI
+            # and memory behave the same as for a live response
+            self._pending_tokens.append(response.generations[0][0].text)
+        self._streamed_runs.discard(run_id)
+        self.flush()
+        # Later chains read the message back through the chat history, so make its content whole
+        st.session_state.memory_handler.materialize()
+
+    def on_llm_error(self, error: BaseException, **kwargs: Any) -> Any:
+        self.flush()
+
+    def flush(self):
+        """
+        Append the pending tokens to the last message as one chunk and re-render it.
+
+        The text is read from the streaming buffer; the message itself is materialized once, in
+        `on_llm_end`.
+        """
+        self._last_flush = time.monotonic()
+        if not self._pending_tokens:
+            return
+        memory_handler = st.session_state.memory_handler
+        memory_handler.append_last_message(''.join(self._pending_tokens))
+        self._pending_tokens = []
         # Display the message in the LLM container
-        display_message(message, container=self.llm_container)
+        self.llm_container.markdown(memory_handler.streaming_text())
 
-def get_streamhandler_cb() -> BaseCallbackHandler:
+def get_streamhandler_cb(**kwargs) -> BaseCallbackHandler:
     """
     Creates a StreamHandler callback handler that integrates fully with any LangChain ChatLLM integration.
     This function ensures that all callback methods run within the Streamlit execution context,
     fixing the NoSessionContext() error commonly encountered in Streamlit callbacks.
 
+    Keyword arguments (`flush_interval`, `flush_tokens`) are forwarded to StreamHandler.
+
     Returns:
         BaseCallbackHandler: An instance of StreamHandler configured for full integration
                              with ChatLLM, enabling dynamic updates in the Streamlit app.
@@ -72,6 +121,8 @@ def get_streamhandler_cb() -> BaseCallbackHandler:
             Wrapper function that adds the Streamlit context and then calls the original function.
             If the Streamlit context is not set, it can lead to NoSessionContext() errors, which this
             wrapper resolves by ensuring that the correct context is used when the function runs.
+            The thread's previous context is restored afterwards: callbacks run inline on the shared
+            event-loop thread, which must not keep one session's context for the next session.
 
             Args:
                 *args: Positional arguments to pass to the original function.
@@ -82,13 +133,18 @@ def get_streamhandler_cb() -> BaseCallbackHandler:
             # Add the previously captured Streamlit context to the current execution.
             # This step fixes NoSessionContext() errors by ensuring that Streamlit knows which session
             # is executing the code, allowing it to properly manage session state and updates.
-            add_script_run_ctx(ctx=ctx)
-            return fn(*args, **kwargs)  # Call the original function with its arguments
+            thread = threading.current_thread()
+            previous_ctx = getattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, None)
+            add_script_run_ctx(thread, ctx)
+            try:
+                return fn(*args, **kwargs)  # Call the original function with its arguments
+            finally:
+                setattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, previous_ctx)
 
         return wrapper
 
     # Create an instance of your StreamHandler
-    stream_handler = StreamHandler()
+    stream_handler = StreamHandler(**kwargs)
 
     # Iterate over all methods of the StreamHandler instance
     for method_name, method_func in inspect.getmembers(stream_handler, predicate=inspect.ismethod):
@@ -100,4 +156,12 @@ def get_streamhandler_cb() -> BaseCallbackHandler:
     # Return the fully configured StreamHandler instance, now context-aware and integrated with any ChatLLM
     return stream_handler
 
-
+async def areplay_response(text: str, callbacks: list = None, name: str = 'cache'):
+    """
+    Emit a stored answer through the callback handlers as a finished LLM run with no streamed tokens.
+    StreamHandler renders such runs in `on_llm_end`, exactly as it does for LLM cache hits.
+    """
+    manager = AsyncCallbackManager.configure(inheritable_callbacks=callbacks)
+    run_managers = await manager.on_llm_start({'name': name}, [''])
+    for run_manager in run_managers:
+        await run_manager.on_llm_end(LLMResult(generations=[[Generation(text=text)]]))
@@ -0,0 +1,20 @@
+from functools import lru_cache
+import tiktoken
+
+_FALLBACK_ENCODING = 'cl100k_base'
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str = None) -> tiktoken.Encoding:
+    """
+    Return the tiktoken encoding for a model, falling back to cl100k_base for unknown models.
+    Encodings are cached for the life of the process.
+    """
+    if not model:
+        return tiktoken.get_encoding(_FALLBACK_ENCODING)
+    try:
+        return tiktoken.encoding_for_model(model)
+    except (KeyError, TypeError):
+        return tiktoken.get_encoding(_FALLBACK_ENCODING)
+
+def count_tokens(text: str, model: str = None) -> int:
+    return len(get_encoding(model).encode(text, disallowed_special=()))
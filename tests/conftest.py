@@ -0,0 +1,13 @@
+import pytest
+
+from src.utils import tokens
+
+class WordEncoding:
+    """ Offline stand-in for a tiktoken encoding: one token per whitespace-separated word. """
+    def encode(self, text, disallowed_special=()):
+        return text.split()
+
+@pytest.fixture(autouse=True)
+def offline_tokens(monkeypatch):
+    # tiktoken downloads its encodings on first use; tests count words instead
+    monkeypatch.setattr(tokens, 'get_encoding', lambda model=None: WordEncoding())
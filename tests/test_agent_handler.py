@@ -0,0 +1,53 @@
+import pytest
+import streamlit as st
+from langchain.memory import ConversationBufferMemory
+from langchain_core.runnables import RunnableLambda
+
+from src.agents.agent_handler import AgentHandler
+from src.agents.agent_registry import AgentRegistry
+from src.agents.base_agent import ChainableAgent, register_chain
+
+class EchoAgent(ChainableAgent):
+    """ Agent without an LLM; its chain returns the role and the history it sees. """
+    def __init__(self, title, **kwargs):
+        super().__init__(title, **kwargs)
+
+    def _build_llm(self):
+        self.llm = None
+
+    @register_chain
+    def _build_chain(self):
+        return self.load_history() | RunnableLambda(lambda history: [m.content for m in history])
+
+@pytest.fixture
+def agent_handler(tmp_path, monkeypatch):
+    monkeypatch.setitem(AgentRegistry._registry, 'echo', EchoAgent)
+    monkeypatch.setattr(st.session_state, 'memory_cache', ConversationBufferMemory(return_messages=True),
+                        raising=False)
+    config = tmp_path / 'agents.yaml'
+    config.write_text('first:\n  type: echo\n  role: first role\nsecond:\n  type: echo\n  role: second role\n')
+    return AgentHandler(str(config))
+
+def test_pooled_agent_is_reused_with_its_session_state_reset(agent_handler):
+    first = agent_handler.active_agent
+    first.role = 'role changed during the session'
+    first.internal_memory.add_ai_message('private note')
+
+    agent_handler.active_agent = 'second'
+    agent_handler.active_agent = 'first'
+
+    assert agent_handler.active_agent is first
+    assert first.role == 'first role'
+    assert first.internal_memory.own_messages == []
+
+def test_pooled_agent_follows_a_cleared_memory_cache(agent_handler):
+    first = agent_handler.active_agent
+    st.session_state.memory_cache.chat_memory.add_user_message('old conversation')
+    assert first.chains['_build_chain'].invoke({}) == ['old conversation']
+
+    agent_handler.active_agent = 'second'
+    st.session_state.memory_cache = ConversationBufferMemory(return_messages=True)
+    st.session_state.memory_cache.chat_memory.add_user_message('new conversation')
+    agent_handler.active_agent = 'first'
+
+    assert first.chains['_build_chain'].invoke({}) == ['new conversation']
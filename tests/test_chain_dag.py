@@ -0,0 +1,56 @@
+import asyncio
+from collections import OrderedDict
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from src.agents.base_agent import ChainableAgent
+
+def make_agent() -> ChainableAgent:
+    """ A ChainableAgent with no LLM or session memory; tests register chains directly. """
+    agent = ChainableAgent.__new__(ChainableAgent)
+    agent.role = 'role'
+    agent.chains = OrderedDict()
+    agent.chain_dependencies = OrderedDict()
+    agent.chain_output_keys = {}
+    return agent
+
+def test_independent_chains_overlap_and_dependents_get_their_results():
+    agent = make_agent()
+    running, peak = set(), []
+
+    def step(name, value):
+        async def run(inputs):
+            running.add(name)
+            peak.append(len(running))
+            await asyncio.sleep(0.05)
+            running.discard(name)
+            return value(inputs)
+        return RunnableLambda(run)
+
+    agent._add_chain('retrieve', step('retrieve', lambda inputs: 'docs'), depends_on=[], output_key='context')
+    agent._add_chain('history', step('history', lambda inputs: 'past'), depends_on=[])
+    answer = lambda inputs: f"{inputs['query']}|{inputs['context']}|{inputs['history']}"
+    agent._add_chain('answer', step('answer', answer), depends_on=['retrieve', 'history'])
+    agent._validate_chain_graph()
+
+    assert asyncio.run(agent._arun_chains('q')) == 'q|docs|past'
+    assert max(peak) == 2
+
+def test_default_dependency_is_the_previous_chain():
+    agent = make_agent()
+    agent._add_chain('first', RunnableLambda(lambda inputs: 1))
+    agent._add_chain('second', RunnableLambda(lambda inputs: inputs['first'] + 1))
+    assert agent.chain_dependencies['second'] == ['first']
+    assert asyncio.run(agent._arun_chains('q')) == 2
+
+@pytest.mark.parametrize('dependencies, message', [
+    ({'a': ['b'], 'b': ['a']}, 'cycle'),
+    ({'a': ['missing']}, 'unknown chain'),
+])
+def test_invalid_graphs_are_rejected(dependencies, message):
+    agent = make_agent()
+    for name, depends_on in dependencies.items():
+        agent._add_chain(name, RunnableLambda(lambda inputs: None), depends_on=depends_on)
+    with pytest.raises(ValueError, match=message):
+        agent._validate_chain_graph()
@@ -0,0 +1,33 @@
+import time
+
+from src.utils.concurrency import run_coroutine, thread_map
+
+def test_thread_map_keeps_order_and_replaces_failures_and_timeouts():
+    def work(item):
+        if item == 'fail':
+            raise RuntimeError(item)
+        if item == 'slow':
+            time.sleep(1)
+        return item.upper()
+
+    start = time.monotonic()
+    results = thread_map(work, ['a', 'fail', 'slow', 'b'], timeout=0.2, default='-')
+
+    assert results == ['A', '-', '-', 'B']
+    assert time.monotonic() - start < 0.8
+
+def test_thread_map_per_item_timeouts_are_measured_from_the_start():
+    def work(delay):
+        time.sleep(delay)
+        return delay
+
+    start = time.monotonic()
+    results = thread_map(work, [0.3, 0.3, 0.05], timeout=[0.1, 0.5, 0.1])
+
+    assert results == [None, 0.3, 0.05]
+    assert time.monotonic() - start < 0.45
+
+def test_run_coroutine_runs_on_the_shared_loop():
+    async def answer():
+        return 42
+    assert run_coroutine(answer(), timeout=5) == 42
@@ -0,0 +1,94 @@
+import threading
+from typing import List
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from src.rag.context import WINDOW_SEPARATOR, ContextExpander, build_context_assembler
+from src.rag.doc_store import DocStore
+
+class KeywordEmbeddings(Embeddings):
+    KEYWORDS = ['robot', 'camera', 'physics']
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [[text.count(word) + 0.01 for word in self.KEYWORDS] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+def text(content):
+    return Document(page_content=content)
+
+def test_mmr_drops_near_duplicates_and_diversifies():
+    assembler = build_context_assembler(KeywordEmbeddings(), {'mmr': {'lambda_mult': 0.5}})
+    docs = [text('robot arm'), text('robot robot arm arm'), text('robot camera'), text('physics')]
+
+    assert [doc.page_content for doc in assembler.rerank('robot', docs)] == ['robot arm', 'robot camera', 'physics']
+
+def test_assemble_packs_the_reranked_chunks_into_the_budget():
+    assembler = build_context_assembler(KeywordEmbeddings(), {'max_tokens': 4, 'mmr': {'lambda_mult': 1.0, 'top_k': 3}})
+    docs = [text('physics engine'), text('robot robot robot arm'), text('robot camera')]
+
+    # The best chunk is always kept; the others only while the budget lasts
+    assert [doc.page_content for doc in assembler.assemble('robot', docs)] == ['robot robot robot arm']
+    assembler.max_tokens = 6
+    assert [doc.page_content for doc in assembler.assemble('robot', docs)] == ['robot robot robot arm', 'robot camera']
+
+def chunk(source, chunk_id):
+    return Document(page_content=f'{source[0]}{chunk_id} ', metadata={'source': source, 'chunk_id': chunk_id})
+
+def doc_store(tmp_path, **sizes):
+    store = DocStore(str(tmp_path / 'docs.sqlite'))
+    for name, size in sizes.items():
+        store.add_documents([chunk(f'{name}.pdf', chunk_id) for chunk_id in range(size)])
+    return store
+
+class FakeVectorStore:
+    def __init__(self, chunks=(), block: threading.Event = None):
+        self.chunks = {f"{doc.metadata['source']}#{doc.metadata['chunk_id']}": doc for doc in chunks}
+        self.block = block
+
+    def fetch_by_ids(self, ids):
+        if self.block:
+            self.block.wait(5)
+        return [self.chunks[record_id] for record_id in ids if record_id in self.chunks]
+
+    def fetch_by_metadata(self, filter):
+        return []
+
+def texts(sections):
+    return [(hit.metadata['source'], text) for hit, text in sections]
+
+def test_windows_merge_around_hits_and_mark_gaps(tmp_path):
+    expander = ContextExpander(doc_store(tmp_path, a=10), FakeVectorStore(), window=1)
+
+    assert texts(expander.expand([chunk('a.pdf', 4), chunk('a.pdf', 2)])) == [('a.pdf', 'a1 a2 a3 a4 a5 ')]
+    assert texts(expander.expand([chunk('a.pdf', 1), chunk('a.pdf', 7)])) == [
+        ('a.pdf', 'a0 a1 a2 ' + WINDOW_SEPARATOR + 'a6 a7 a8 ')]
+
+def test_budget_keeps_every_hit_before_growing_windows_by_rank(tmp_path):
+    expander = ContextExpander(doc_store(tmp_path, a=10, b=10), FakeVectorStore(), window=2, max_tokens=4)
+
+    assert texts(expander.expand([chunk('a.pdf', 5), chunk('b.pdf', 5)])) == [
+        ('a.pdf', 'a4 a5 a6 '), ('b.pdf', 'b5 ')]
+
+def test_full_mode_falls_back_to_windows_for_documents_over_budget(tmp_path):
+    expander = ContextExpander(doc_store(tmp_path, a=3, b=10), FakeVectorStore(), mode='full', window=1,
+                               max_tokens=6)
+
+    assert texts(expander.expand([chunk('a.pdf', 0), chunk('b.pdf', 5)])) == [
+        ('a.pdf', 'a0 a1 a2 '), ('b.pdf', 'b4 b5 b6 ')]
+
+def test_neighbours_come_from_the_vector_store_when_the_doc_store_lacks_the_source(tmp_path):
+    vector_store = FakeVectorStore([chunk('c.pdf', chunk_id) for chunk_id in range(5)])
+    expander = ContextExpander(doc_store(tmp_path), vector_store, window=1)
+
+    assert texts(expander.expand([chunk('c.pdf', 2)])) == [('c.pdf', 'c1 c2 c3 ')]
+
+def test_slow_fetches_fall_back_to_the_hits(tmp_path):
+    release = threading.Event()
+    expander = ContextExpander(doc_store(tmp_path), FakeVectorStore(block=release), window=1, fetch_timeout=0.1)
+    try:
+        assert texts(expander.expand([chunk('c.pdf', 2)])) == [('c.pdf', 'c2 ')]
+    finally:
+        release.set()
@@ -0,0 +1,32 @@
+from langchain_core.documents import Document
+
+from src.rag.doc_store import DocStore
+
+def chunk(source, chunk_id, text):
+    return Document(page_content=text, metadata={'source': source, 'chunk_id': chunk_id})
+
+def test_documents_are_reassembled_in_chunk_order(tmp_path):
+    store = DocStore(str(tmp_path / 'docs.sqlite'))
+    store.add_documents([chunk('a.pdf', 1, 'world'), chunk('a.pdf', 0, 'hello '), chunk('b.pdf', 0, 'other')])
+
+    assert store.get_document('a.pdf') == 'hello world'
+    assert [doc.page_content for doc in store.get_chunks('a.pdf', start=1)] == ['world']
+    assert store.has_source('b.pdf')
+    assert store.get_document('missing.pdf') is None
+
+def test_batched_loads_rebuild_once_and_deletes_update_the_document(tmp_path):
+    store = DocStore(str(tmp_path / 'docs.sqlite'))
+    store.add_documents([chunk('a.pdf', 0, 'one ')], rebuild=False)
+    store.add_documents([chunk('a.pdf', 1, 'two ')], rebuild=False)
+    assert store.get_document('a.pdf') is None
+    store.rebuild_documents(['a.pdf'])
+    assert store.get_document('a.pdf') == 'one two '
+
+    store.delete_chunks('a.pdf', [0])
+    store.rebuild_documents(['a.pdf'])
+    assert store.get_document('a.pdf') == 'two '
+
+    store.replace_source('a.pdf', [chunk('a.pdf', 0, 'new')])
+    assert store.get_document('a.pdf') == 'new'
+    store.delete_source('a.pdf')
+    assert not store.has_source('a.pdf')
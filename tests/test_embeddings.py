@@ -0,0 +1,122 @@
+import asyncio
+import threading
+from concurrent.futures import wait
+from typing import List
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from src.rag.embeddings import CachedEmbeddings, EmbeddingBatcher
+from src.utils.concurrency import IO_MAX_WORKERS, _io_executor
+
+class CountingEmbeddings(Embeddings):
+    """ Deterministic embeddings that record every provider call. """
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
+
+def test_only_misses_reach_the_provider_and_the_sqlite_tier_persists(tmp_path):
+    path = str(tmp_path / 'embeddings.sqlite')
+    underlying = CountingEmbeddings()
+    embeddings = CachedEmbeddings(underlying, 'model', path=path, lru_size=1)
+
+    assert embeddings.embed_documents(['a b', 'cd', 'a  b']) == [[3.0, 1.0], [2.0, 1.0], [3.0, 1.0]]
+    assert underlying.calls == [['a b', 'cd']]
+    # Evicted from the 1-entry LRU, served from SQLite
+    assert embeddings.embed_query('a b') == [3.0, 1.0]
+    assert CachedEmbeddings(underlying, 'model', path=path).embed_query('cd') == [2.0, 1.0]
+    assert len(underlying.calls) == 1
+    # The model is part of the key
+    CachedEmbeddings(underlying, 'other-model', path=path).embed_query('cd')
+    assert len(underlying.calls) == 2
+
+def test_async_path_keeps_sqlite_off_the_event_loop(tmp_path):
+    embeddings = CachedEmbeddings(CountingEmbeddings(), 'model', path=str(tmp_path / 'embeddings.sqlite'))
+    threads = []
+    for name in ('_lookup', '_store'):
+        original = getattr(embeddings, name)
+        def record(*args, _original=original):
+            threads.append(threading.current_thread())
+            return _original(*args)
+        setattr(embeddings, name, record)
+
+    async def main():
+        vector = await embeddings.aembed_query('hello')
+        return vector, threading.current_thread()
+
+    vector, loop_thread = asyncio.run(main())
+    assert vector == [5.0, 1.0]
+    assert len(threads) == 2 and loop_thread not in threads
+
+def test_batcher_combines_concurrent_callers_into_one_request():
+    underlying = CountingEmbeddings()
+    batcher = EmbeddingBatcher(underlying.embed_documents, max_batch=8, max_wait=0.2)
+    results = {}
+    threads = [threading.Thread(target=lambda text=text: results.update({text: batcher.embed([text])}))
+               for text in ['a', 'bb', 'a']]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == {'a': [[1.0, 1.0]], 'bb': [[2.0, 1.0]]}
+    assert len(underlying.calls) == 1 and sorted(underlying.calls[0]) == ['a', 'bb']
+
+def test_batcher_callers_on_the_shared_io_pool_do_not_starve_it():
+    batcher = EmbeddingBatcher(CountingEmbeddings().embed_documents, max_batch=4, max_wait=0.001, timeout=10)
+    futures = [_io_executor.submit(batcher.embed, [str(i)]) for i in range(IO_MAX_WORKERS)]
+
+    done, pending = wait(futures, timeout=10)
+    assert not pending
+    assert sorted(future.result()[0][0] for future in done) == sorted(float(len(str(i))) for i in range(IO_MAX_WORKERS))
+
+def test_batcher_failures_and_timeouts_reach_the_caller():
+    release = threading.Event()
+
+    def embed_fn(texts):
+        if texts == ['slow']:
+            release.wait(5)
+        raise ValueError('boom')
+
+    batcher = EmbeddingBatcher(embed_fn, max_wait=0.001, timeout=0.1)
+    try:
+        with pytest.raises(ValueError):
+            batcher.embed(['fail'])
+        with pytest.raises(TimeoutError):
+            batcher.embed(['slow'])
+        with pytest.raises(TimeoutError):
+            asyncio.run(batcher.aembed(['slow']))
+    finally:
+        release.set()
+
+def test_an_impatient_caller_does_not_fail_its_batch():
+    started, release = threading.Event(), threading.Event()
+
+    def embed_fn(texts):
+        started.set()
+        release.wait(5)
+        return [[float(len(text)), 1.0] for text in texts]
+
+    batcher = EmbeddingBatcher(embed_fn, max_wait=0.2, timeout=5)
+
+    async def main():
+        impatient = asyncio.ensure_future(asyncio.wait_for(batcher.aembed(['a']), 0.1))
+        await asyncio.sleep(0.01)
+        patient = asyncio.ensure_future(batcher.aembed(['bb']))
+        with pytest.raises(TimeoutError):
+            await impatient
+        await asyncio.to_thread(started.wait, 5)
+        release.set()
+        return await patient
+
+    # Both texts share one batch: it closes only after the impatient caller has given up
+    assert asyncio.run(main()) == [[2.0, 1.0]]
@@ -0,0 +1,50 @@
+import pytest
+from langchain.memory import ConversationBufferMemory
+
+from src.utils import tokens
+from src.utils.history_handler import HistoryWindow
+
+@pytest.fixture
+def memory():
+    memory = ConversationBufferMemory(return_messages=True)
+    for text in ['one two three', 'four five', 'six', 'seven eight nine ten']:
+        memory.chat_memory.add_user_message(text)
+    return memory
+
+def test_keeps_the_newest_messages_that_fit_the_budget(memory):
+    # Each message costs its words plus 4 tokens of overhead: 7, 6, 5, 8
+    window = HistoryWindow(memory, max_tokens=13)
+    assert [m.content for m in window.load_messages()] == ['six', 'seven eight nine ten']
+
+def test_latest_message_is_kept_even_over_budget(memory):
+    window = HistoryWindow(memory, max_tokens=1)
+    assert [m.content for m in window.load_messages()] == ['seven eight nine ten']
+
+def test_no_budget_returns_everything(memory):
+    assert len(HistoryWindow(memory, max_tokens=None).load_messages()) == 4
+
+def test_counts_are_cached_and_recounted_when_content_changes(memory, monkeypatch):
+    counted = []
+    count_tokens = tokens.count_tokens
+    monkeypatch.setattr('src.utils.history_handler.count_tokens',
+                        lambda text, model=None: counted.append(text) or count_tokens(text, model))
+    window = HistoryWindow(memory, max_tokens=100)
+    window.load_messages()
+    window.load_messages()
+    assert len(counted) == 4
+
+    memory.chat_memory.messages[-1].content += ' eleven'
+    window.load_messages()
+    assert counted[4:] == ['seven eight nine ten eleven']
+
+    memory.clear()
+    memory.chat_memory.add_user_message('fresh')
+    assert [m.content for m in window.load_messages()] == ['fresh']
+
+def test_same_length_edits_are_recounted(memory):
+    window = HistoryWindow(memory, max_tokens=100)
+    window.load_messages()
+    # Same length, different token count: a length-keyed cache would keep the stale count of 5
+    memory.chat_memory.messages[2].content = 's x'
+    window.load_messages()
+    assert window.token_cache[2][1] == 6
@@ -0,0 +1,111 @@
+from typing import Dict, List
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from src.rag import ingest, local_store
+from src.rag.doc_store import DocStore
+from src.rag.lexical import LexicalIndex
+from src.rag.local_store import LocalVectorStore
+from src.rag.semantic_cache import SemanticCache
+
+class LengthEmbeddings(Embeddings):
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.embedded.extend(texts)
+        return [[float(len(text)), float(text.count(' ')) + 1.0] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    """ Local-backend ingestion into tmp_path, reading 'PDF' pages from the returned `pages` dict. """
+    pages: Dict[str, List[str]] = {}
+    embeddings = LengthEmbeddings()
+    monkeypatch.setattr(ingest, 'iter_pages', lambda paths: (
+        Document(page_content=text, metadata={'source': path, 'page': number})
+        for path in paths for number, text in enumerate(pages[path])))
+    monkeypatch.setattr(ingest, 'get_embeddings', lambda: embeddings)
+    monkeypatch.setattr(ingest, 'get_doc_store', lambda name: DocStore(str(tmp_path / 'docs.sqlite')))
+    monkeypatch.setattr(ingest, 'get_lexical_index', lambda name: LexicalIndex(str(tmp_path / 'lexical.sqlite')))
+    monkeypatch.setattr(ingest, 'get_semantic_cache', lambda: SemanticCache(str(tmp_path / 'semantic.sqlite')))
+
+    def run(paths, **kwargs):
+        kwargs = {'batch_size': 2, 'concurrency': 2, 'chunk_size': 20, 'chunk_overlap': 0,
+                  'checkpoint_every': 1, 'manifest_path': str(tmp_path / 'manifest.sqlite'), **kwargs}
+        return ingest.ingest_documents(paths, 'test', {'backend': 'local', 'path': str(tmp_path / 'vectors')},
+                                       **kwargs)
+
+    def open_store():
+        return LocalVectorStore(embeddings, path=str(tmp_path / 'vectors'))
+
+    return pages, embeddings, run, open_store
+
+WORDS = 'alpha beta gamma delta epsilon zeta eta theta iota kappa lambda mu nu xi omicron pi rho sigma tau'
+
+def test_ingest_writes_every_chunk_and_checkpoints_incrementally(index, monkeypatch):
+    pages, embeddings, run, open_store = index
+    pages['a.pdf'] = [WORDS, WORDS.upper()]
+    pages['b.pdf'] = ['short page']
+    full_writes = []
+    original = local_store._SQLiteRecords.write
+    monkeypatch.setattr(local_store._SQLiteRecords, 'write',
+                        staticmethod(lambda *args: full_writes.append(args) or original(*args)))
+
+    written = run(['a.pdf', 'b.pdf'])
+
+    store = open_store()
+    assert written == len(store) == len(embeddings.embedded)
+    assert [doc.metadata['chunk_id'] for doc in store.fetch_source('a.pdf')] == list(range(len(store) - 1))
+    assert store.fetch_by_ids(['b.pdf#0'])[0].page_content == 'short page'
+    # Only the first checkpoint writes the index files from scratch; later ones append
+    assert len(full_writes) == 1
+
+def test_rerun_writes_only_changed_chunks_and_deletes_stale_ones(index):
+    pages, embeddings, run, open_store = index
+    pages['a.pdf'] = [WORDS, 'second page']
+    pages['b.pdf'] = ['short page']
+    first = run(['a.pdf', 'b.pdf'])
+
+    embeddings.embedded.clear()
+    assert run(['a.pdf', 'b.pdf']) == 0
+    assert embeddings.embedded == []
+
+    # a.pdf loses its second page and b.pdf changes: 1 deletion plus 1 rewrite
+    pages['a.pdf'] = [WORDS]
+    pages['b.pdf'] = ['other page']
+    assert run(['a.pdf', 'b.pdf']) == 2
+    assert embeddings.embedded == ['other page']
+    store = open_store()
+    assert len(store) == first - 1
+    assert all(doc.page_content != 'second page' for doc in store.fetch_source('a.pdf'))
+    assert store.fetch_by_ids(['b.pdf#0'])[0].page_content == 'other page'
+
+def test_prune_deletes_sources_outside_the_run_and_force_rewrites(index):
+    pages, embeddings, run, open_store = index
+    pages['a.pdf'] = ['first page']
+    pages['b.pdf'] = ['short page']
+    run(['a.pdf', 'b.pdf'])
+
+    assert run(['a.pdf']) == 0
+    assert run(['a.pdf'], prune=True) == 1
+    assert open_store().fetch_source('b.pdf') == []
+
+    embeddings.embedded.clear()
+    assert run(['a.pdf'], force=True) == 1
+    assert embeddings.embedded == ['first page']
+
+def test_manifest_round_trip(tmp_path):
+    manifest = ingest.Manifest(str(tmp_path / 'manifest.sqlite'))
+    manifest.record([('a#0', 'a', 0, 'h0'), ('a#1', 'a', 1, 'h1'), ('b#0', 'b', 0, 'h2')])
+    manifest.record([('a#1', 'a', 1, 'changed')])
+
+    assert manifest.hashes(['a#0', 'a#1', 'missing']) == {'a#0': 'h0', 'a#1': 'changed'}
+    assert sorted(manifest.chunks('a')) == [('a#0', 0), ('a#1', 1)]
+    assert manifest.sources() == {'a', 'b'}
+    manifest.delete(['b#0'])
+    assert manifest.sources() == {'a'}
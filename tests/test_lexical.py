@@ -0,0 +1,34 @@
+from langchain_core.documents import Document
+
+from src.rag.lexical import LexicalIndex, tokenize
+
+def chunk(record_id, text):
+    return Document(id=record_id, page_content=text, metadata={'source': record_id.split('#')[0]})
+
+def test_identifiers_are_indexed_whole_and_by_parts():
+    assert tokenize('omni.isaac.core.ArticulationView') == [
+        'omni.isaac.core.articulationview', 'omni', 'isaac', 'core', 'articulationview', 'articulation', 'view']
+    assert 'episode' in tokenize('max_episode_length')
+
+def test_search_ranks_exact_identifier_matches_first(tmp_path):
+    index = LexicalIndex(str(tmp_path / 'lexical.sqlite'))
+    index.add_documents([
+        chunk('a.pdf#0', 'Create an ArticulationView to control a robot.'),
+        chunk('a.pdf#1', 'The view of the camera follows the robot.'),
+        chunk('b.pdf#0', 'Physics scenes and their settings.'),
+    ])
+
+    results = index.search('ArticulationView', k=5)
+    assert [doc.id for doc, _ in results][0] == 'a.pdf#0'
+    assert all(score > 0 for _, score in results)
+    assert index.search('...') == []
+
+def test_re_adding_replaces_and_delete_removes(tmp_path):
+    index = LexicalIndex(str(tmp_path / 'lexical.sqlite'))
+    index.add_documents([chunk('a.pdf#0', 'robot arm')])
+    index.add_documents([chunk('a.pdf#0', 'camera sensor')])
+
+    assert index.search('robot') == []
+    assert [doc.page_content for doc, _ in index.search('camera')] == ['camera sensor']
+    index.delete(['a.pdf#0', 'missing#0'])
+    assert index.search('camera') == []
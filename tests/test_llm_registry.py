@@ -0,0 +1,26 @@
+import threading
+
+import pytest
+
+from src.agents.llm_registry import LLMRegistry, SingleFlightChatOpenAI
+
+@pytest.fixture
+def fresh_registry(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-key')
+    monkeypatch.setattr(LLMRegistry, '_llms', {})
+    monkeypatch.setattr(LLMRegistry, '_http_client', None)
+    monkeypatch.setattr(LLMRegistry, '_http_async_client', None)
+
+def test_first_build_in_a_fresh_registry_completes_and_is_shared(fresh_registry):
+    built = []
+    thread = threading.Thread(target=lambda: built.append(LLMRegistry.get_llm('openai', 'gpt-4o-mini', streaming=True)),
+                              daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+
+    assert not thread.is_alive(), 'get_llm deadlocked building the first client'
+    llm = built[0]
+    assert isinstance(llm, SingleFlightChatOpenAI)
+    assert LLMRegistry.get_llm('openai', 'gpt-4o-mini', streaming=True) is llm
+    http_client, _ = LLMRegistry.get_http_clients()
+    assert llm.http_client is http_client
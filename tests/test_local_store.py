@@ -0,0 +1,115 @@
+import os
+from typing import List
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from src.rag import local_store
+from src.rag.local_store import LocalVectorStore
+
+class KeywordEmbeddings(Embeddings):
+    """ Embeds text as counts of a few keywords, so similarity is predictable. """
+    KEYWORDS = ['robot', 'camera', 'physics', 'light']
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [[text.count(word) + 0.01 for word in self.KEYWORDS] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+TEXTS = ['robot robot arm', 'camera sensor', 'physics engine', 'light and camera', 'robot physics']
+METADATAS = ([{'source': 'a.pdf', 'chunk_id': i} for i in range(3)]
+             + [{'source': 'b.pdf', 'chunk_id': i} for i in range(2)])
+IDS = [f"{m['source']}#{m['chunk_id']}" for m in METADATAS]
+
+def make_store(**kwargs) -> LocalVectorStore:
+    store = LocalVectorStore(KeywordEmbeddings(), **kwargs)
+    store.add_texts(TEXTS, METADATAS, ids=IDS)
+    return store
+
+def contents(docs):
+    return [doc.page_content for doc in docs]
+
+def test_search_filters_and_metadata_fetches():
+    store = make_store()
+    assert contents(store.similarity_search('robot', k=2)) == ['robot robot arm', 'robot physics']
+    assert contents(store.similarity_search('robot', k=1, filter={'source': {'$eq': 'b.pdf'}})) == ['robot physics']
+    either = {'$or': [{'chunk_id': {'$gte': 2}}, {'source': 'b.pdf'}]}
+    assert set(contents(store.similarity_search('camera', k=5, filter=either))) \
+        == {'light and camera', 'physics engine', 'robot physics'}
+    assert contents(store.fetch_source('b.pdf')) == ['light and camera', 'robot physics']
+    assert store.list_ids(prefix='b.pdf#') == ['b.pdf#0', 'b.pdf#1']
+
+def test_upsert_by_id_and_delete():
+    store = make_store()
+    store.add_texts(['light light'], [{'source': 'a.pdf', 'chunk_id': 0}], ids=['a.pdf#0'])
+    assert len(store) == 5
+    assert contents(store.similarity_search('light', k=1)) == ['light light']
+
+    store.delete(['a.pdf#0', 'missing'])
+    assert len(store) == 4
+    assert contents(store.fetch_by_ids(['a.pdf#0', 'b.pdf#1'])) == ['robot physics']
+
+def test_ivf_search_finds_the_exact_best_match():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(400, 16)).astype(np.float32)
+    store = LocalVectorStore(KeywordEmbeddings(), n_lists=8, n_probe=8, ivf_min_size=100, quantization=None)
+    store.add_embeddings([str(i) for i in range(400)], vectors)
+    doc, score = store.similarity_search_by_vector_with_score(vectors[123].tolist(), k=1)[0]
+    assert doc.page_content == '123' and score == pytest.approx(1.0, abs=1e-5)
+
+@pytest.mark.parametrize('quantization', [None, 'float16', 'int8'])
+def test_saved_store_reopens_memory_mapped_with_the_same_results(tmp_path, quantization):
+    path = str(tmp_path / 'index')
+    store = make_store(path=path, quantization=quantization)
+    expected = store.similarity_search_with_score('robot camera', k=3)
+    store.save()
+
+    reopened = LocalVectorStore(KeywordEmbeddings(), path=path)
+    assert isinstance(reopened._vectors, np.memmap)
+    results = reopened.similarity_search_with_score('robot camera', k=3)
+    assert contents(doc for doc, _ in results) == contents(doc for doc, _ in expected)
+    assert [score for _, score in results] == pytest.approx([score for _, score in expected], abs=1e-3)
+    assert contents(reopened.fetch_source('a.pdf')) == TEXTS[:3]
+
+    # Writing to an opened store copies it into memory first; saving publishes the change
+    reopened.delete(['b.pdf#1'])
+    reopened.save()
+    assert len(LocalVectorStore(KeywordEmbeddings(), path=path)) == 4
+
+@pytest.mark.parametrize('quantization', [None, 'float16', 'int8'])
+def test_checkpoints_append_new_rows_and_rewrite_replaced_ones(tmp_path, quantization, monkeypatch):
+    path = str(tmp_path / 'index')
+    store = make_store(path=path, quantization=quantization)
+    store.save()
+    reader = LocalVectorStore(KeywordEmbeddings(), path=path)
+
+    full_writes = []
+    write = local_store._SQLiteRecords.write
+    monkeypatch.setattr(local_store._SQLiteRecords, 'write',
+                        staticmethod(lambda *args: full_writes.append(args) or write(*args)))
+    store.add_texts(['camera camera'], [{'source': 'c.pdf', 'chunk_id': 0}], ids=['c.pdf#0'])
+    store.save()
+    store.add_texts(['robot light'], [{'source': 'c.pdf', 'chunk_id': 1}], ids=['c.pdf#1'])
+    store.save()
+
+    assert full_writes == []
+    assert os.path.getsize(os.path.join(path, 'vectors.f32')) == 7 * 4 * 4
+    # A reader opened before the checkpoints keeps its own row count
+    assert len(reader) == 5 and reader.list_ids(prefix='c.pdf') == []
+    assert reader.fetch_by_ids(['c.pdf#0']) == []
+
+    # Replacing a saved row never touches the files readers have mapped
+    vectors_before = reader._vectors.copy()
+    store.add_texts(['light light'], [{'source': 'b.pdf', 'chunk_id': 1}], ids=['b.pdf#1'])
+    store.save()
+    assert len(full_writes) == 1
+    assert np.array_equal(reader._vectors, vectors_before)
+    assert contents(reader.fetch_by_ids(['b.pdf#1'])) == ['robot physics']
+
+    reopened = LocalVectorStore(KeywordEmbeddings(), path=path)
+    assert len(reopened) == 7
+    assert contents(reopened.fetch_source('b.pdf')) == ['light and camera', 'light light']
+    assert contents(reopened.similarity_search('camera camera', k=1)) == ['camera camera']
+    assert contents(reopened.similarity_search('light', k=1)) == ['light light']
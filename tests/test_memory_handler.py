@@ -0,0 +1,20 @@
+from langchain.memory import ConversationBufferMemory
+
+from src.utils.memory_handler import MemoryOverlay
+
+def test_overlay_shares_parent_messages_and_keeps_its_own_separately():
+    parent = ConversationBufferMemory(return_messages=True)
+    parent.chat_memory.add_user_message('hello')
+    overlay = MemoryOverlay(parent)
+
+    overlay.add_ai_message('thinking')
+    parent.chat_memory.add_ai_message('hi')
+
+    assert [m.content for m in overlay.load_memory_variables()['history']] == ['hello', 'hi', 'thinking']
+    assert [m.content for m in parent.chat_memory.messages] == ['hello', 'hi']
+
+    overlay.clear()
+    assert [m.content for m in overlay.messages] == ['hello', 'hi']
+    # Reading an overlay without messages of its own must not hand out the parent's list
+    overlay.messages.append('mutated')
+    assert len(parent.chat_memory.messages) == 2
@@ -0,0 +1,108 @@
+import asyncio
+import itertools
+import queue
+import threading
+import time
+
+import pytest
+
+from src.utils.rate_limiter import AdmissionController, TokenBucket
+from src.utils.single_flight import SingleFlight
+
+def controller(**kwargs) -> AdmissionController:
+    return AdmissionController('model', **{'max_concurrency': 1, 'rpm': 10000, 'tpm': 10 ** 6, **kwargs})
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+def test_token_bucket_delay_take_and_give():
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.delay(60) == 0
+    bucket.take(60)
+    assert bucket.delay(30) == pytest.approx(30, abs=0.1)
+    bucket.give(30)
+    assert bucket.delay(30) == 0
+    # A request larger than the bucket waits for a full bucket, not forever
+    bucket = TokenBucket(per_minute=60)
+    bucket.take(1000)
+    assert bucket.delay(1000) == pytest.approx(60, abs=0.1)
+
+def test_waiting_sessions_are_admitted_round_robin():
+    limiter = controller()
+    limiter.acquire(1, 'holder')
+    admitted = queue.Queue()
+
+    def call(name, session):
+        limiter.acquire(1, session)
+        admitted.put(name)
+
+    for queued, (name, session) in enumerate([('a1', 'a'), ('a2', 'a'), ('a3', 'a'), ('b1', 'b')], start=1):
+        threading.Thread(target=call, args=(name, session), daemon=True).start()
+        wait_until(lambda: limiter.stats()['queued'] == queued)
+
+    order = []
+    for _ in range(4):
+        limiter.release(1)
+        order.append(admitted.get(timeout=5))
+    assert order == ['a1', 'b1', 'a2', 'a3']
+    assert limiter.stats()['admitted'] == 5
+
+def test_release_settles_the_token_estimate():
+    limiter = controller(max_concurrency=2, tpm=600)
+    limiter.acquire(500)
+    assert limiter.tokens.level == pytest.approx(100, abs=1)
+    # Used fewer tokens than estimated: the difference goes back
+    limiter.release(500, 100)
+    assert limiter.tokens.level == pytest.approx(500, abs=1)
+    # Used more: the excess is charged
+    limiter.acquire(100)
+    limiter.release(100, 300)
+    assert limiter.tokens.level == pytest.approx(200, abs=1)
+    assert limiter.active == 0
+
+def test_acquire_times_out_and_leaves_the_queue():
+    limiter = controller(acquire_timeout=0.05)
+    limiter.acquire(1)
+
+    with pytest.raises(TimeoutError):
+        limiter.acquire(1)
+    with pytest.raises(TimeoutError):
+        asyncio.run(limiter.aacquire(1))
+    assert limiter.stats()['queued'] == 0
+    limiter.release(1)
+    limiter.acquire(1)
+
+def test_cancelled_async_waiters_leave_the_queue():
+    async def main():
+        limiter = controller()
+        await limiter.aacquire(1)
+        waiter = asyncio.ensure_future(limiter.aacquire(1))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.sleep(0.01)
+        assert limiter.stats()['queued'] == 0
+        limiter.release(1)
+        assert limiter.active == 0
+
+    asyncio.run(main())
+
+def test_abandoned_streams_close_upstream_and_release_their_slot():
+    limiter, closed = controller(), threading.Event()
+
+    def upstream():
+        try:
+            for item in itertools.count():
+                yield item
+                time.sleep(0.01)
+        finally:
+            closed.set()
+
+    stream = SingleFlight().stream('key', lambda: limiter.limit_stream(upstream, 10, 10, lambda chunk: 1))
+    assert next(stream) == 0
+    assert limiter.active == 1
+    stream.close()
+    assert closed.wait(2)
+    wait_until(lambda: limiter.active == 0)
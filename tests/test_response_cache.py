@@ -0,0 +1,39 @@
+from langchain_core.outputs import Generation
+
+from src.utils.response_cache import SQLiteResponseCache
+
+def test_round_trip_is_keyed_by_prompt_and_llm_string(tmp_path):
+    cache = SQLiteResponseCache(str(tmp_path / 'responses.sqlite'))
+    cache.update('prompt', 'gpt-4o', [Generation(text='answer')])
+
+    assert [g.text for g in cache.lookup('prompt', 'gpt-4o')] == ['answer']
+    assert cache.lookup('prompt', 'gpt-4o-mini') is None
+    assert cache.lookup('other prompt', 'gpt-4o') is None
+    # Persisted: a second connection to the same file sees the entry
+    assert SQLiteResponseCache(str(tmp_path / 'responses.sqlite')).lookup('prompt', 'gpt-4o') is not None
+
+def test_expired_entries_are_not_served(tmp_path, monkeypatch):
+    cache = SQLiteResponseCache(str(tmp_path / 'responses.sqlite'), ttl_seconds=60)
+    now = [1000.0]
+    monkeypatch.setattr('src.utils.response_cache.time.time', lambda: now[0])
+    cache.update('prompt', 'llm', [Generation(text='answer')])
+
+    now[0] += 61
+    assert cache.lookup('prompt', 'llm') is None
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    cache = SQLiteResponseCache(str(tmp_path / 'responses.sqlite'), max_entries=2)
+    now = [1000.0]
+    def tick():
+        now[0] += 1
+        return now[0]
+    monkeypatch.setattr('src.utils.response_cache.time.time', tick)
+
+    cache.update('a', 'llm', [Generation(text='a')])
+    cache.update('b', 'llm', [Generation(text='b')])
+    cache.lookup('a', 'llm')
+    cache.update('c', 'llm', [Generation(text='c')])
+
+    assert cache.lookup('b', 'llm') is None
+    assert cache.lookup('a', 'llm') is not None
+    assert cache.lookup('c', 'llm') is not None
@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+
+import pytest
+import streamlit as st
+from langchain.memory import ConversationBufferMemory
+
+from src.agents import retrieval_agent
+from src.agents.retrieval_agent import RetrievalAgent
+from src.rag.semantic_cache import SemanticCache
+
+class FederatedAgent(RetrievalAgent):
+    """ Retrieval agent without an LLM, searching its own index and vector-vault-1. """
+    def __init__(self, title, **kwargs):
+        self.index_name = 'omniverse-index'
+        self.retriever = SimpleNamespace(vector_stores={'omniverse-index': None, 'vector-vault-1': None})
+        super().__init__(title, **kwargs)
+
+    def _build_llm(self):
+        self.llm = None
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    cache = SemanticCache(str(tmp_path / 'semantic.sqlite'))
+    monkeypatch.setattr(retrieval_agent, 'get_semantic_cache', lambda: cache)
+    monkeypatch.setattr(st.session_state, 'memory_cache', ConversationBufferMemory(return_messages=True),
+                        raising=False)
+    return FederatedAgent('federated', role='', semantic_cache={'threshold': 0.9})
+
+def test_reingesting_a_federated_member_changes_the_cache_scope(agent):
+    scope = agent._semantic_cache_scope('query')
+    assert agent._semantic_cache_scope('query') == scope
+
+    agent.semantic_cache.invalidate_index('vector-vault-1')
+    member_reingested = agent._semantic_cache_scope('query')
+    assert member_reingested != scope
+
+    agent.semantic_cache.invalidate_index('omniverse-index')
+    assert agent._semantic_cache_scope('query') not in (scope, member_reingested)
@@ -0,0 +1,86 @@
+import threading
+from typing import List
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import FakeEmbeddings
+from langchain_core.vectorstores import VectorStore
+
+from src.rag.lexical import LexicalIndex
+from src.rag.retrievers import FederatedRetriever, HybridRetriever
+
+def chunk(source, chunk_id):
+    return Document(id=f'{source}#{chunk_id}', page_content=f'{source} {chunk_id}',
+                    metadata={'source': source, 'chunk_id': chunk_id})
+
+class RankedStore(VectorStore):
+    """ Returns fixed results in order, optionally blocking until `release` is set. """
+    def __init__(self, scored: list, release: threading.Event = None):
+        self.scored = scored
+        self.release = release
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score([], k)]
+
+    @property
+    def embeddings(self):
+        return FakeEmbeddings(size=2)
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k)]
+
+    def similarity_search_by_vector_with_score(self, embedding, k: int = 4, **kwargs):
+        if self.release:
+            self.release.wait(5)
+        return [(Document(id=doc.id, page_content=doc.page_content, metadata=dict(doc.metadata)), score)
+                for doc, score in self.scored[:k]]
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise NotImplementedError
+
+class FixedLexicalIndex(LexicalIndex):
+    def __init__(self, docs: List[Document]):
+        self.docs = docs
+
+    def search(self, query: str, k: int = 10):
+        return [(doc, 1.0) for doc in self.docs[:k]]
+
+def test_hybrid_fuses_by_reciprocal_rank_and_dedupes_chunks():
+    dense = RankedStore([(chunk('a', 0), 0.9), (chunk('a', 1), 0.8), (chunk('b', 0), 0.7)])
+    # b#0 is third on the dense side but first on the lexical side, so it beats a#1 (second, then absent)
+    lexical = FixedLexicalIndex([chunk('b', 0), chunk('a', 0), chunk('c', 0)])
+    retriever = HybridRetriever(vector_store=dense, lexical_index=lexical, k=3)
+
+    assert [doc.id for doc in retriever.invoke('query')] == ['a#0', 'b#0', 'a#1']
+
+def test_hybrid_skips_a_side_that_times_out():
+    release = threading.Event()
+    dense = RankedStore([(chunk('a', 0), 0.9)], release=release)
+    retriever = HybridRetriever(vector_store=dense, lexical_index=FixedLexicalIndex([chunk('c', 0)]), k=3,
+                                timeout=0.1)
+    try:
+        assert [doc.id for doc in retriever.invoke('query')] == ['c#0']
+    finally:
+        release.set()
+
+def test_federated_fuses_indexes_by_rank_not_by_score_scale():
+    # Min-max scaling would rank pinecone's second chunk (0.5 of a 0.4-0.9 spread) above local's (0.79 of 0.79-0.80)
+    retriever = FederatedRetriever(vector_stores={
+        'local': RankedStore([(chunk('a', 0), 0.80), (chunk('a', 1), 0.79)]),
+        'pinecone': RankedStore([(chunk('b', 0), 0.9), (chunk('b', 1), 0.5), (chunk('b', 2), 0.4)]),
+    }, k=4)
+
+    docs = retriever.invoke('query')
+    assert [(doc.metadata['index_name'], doc.id) for doc in docs] == [
+        ('local', 'a#0'), ('pinecone', 'b#0'), ('local', 'a#1'), ('pinecone', 'b#1')]
+
+def test_federated_skips_an_index_that_times_out():
+    release = threading.Event()
+    retriever = FederatedRetriever(vector_stores={
+        'slow': RankedStore([(chunk('a', 0), 1.0)], release=release),
+        'fast': RankedStore([(chunk('b', 0), 0.1)]),
+    }, timeouts={'slow': 0.1}, k=3)
+    try:
+        assert [doc.id for doc in retriever.invoke('query')] == ['b#0']
+    finally:
+        release.set()
@@ -0,0 +1,29 @@
+from src.rag.semantic_cache import SemanticCache
+
+def test_similar_queries_hit_within_scope_and_threshold(tmp_path):
+    cache = SemanticCache(str(tmp_path / 'semantic.sqlite'))
+    cache.update('how to spawn a robot', [1.0, 0.0, 0.0], 'use the spawner', scope='agent', index_name='docs')
+
+    assert cache.lookup([0.99, 0.1, 0.0], 'agent', 'docs', threshold=0.95) == 'use the spawner'
+    assert cache.lookup([0.0, 1.0, 0.0], 'agent', 'docs', threshold=0.95) is None
+    assert cache.lookup([1.0, 0.0, 0.0], 'other agent', 'docs', threshold=0.95) is None
+
+def test_invalidating_an_index_drops_its_answers(tmp_path):
+    cache = SemanticCache(str(tmp_path / 'semantic.sqlite'))
+    cache.update('q', [1.0, 0.0], 'stale answer', scope='agent', index_name='docs')
+    cache.update('q', [1.0, 0.0], 'other index', scope='agent', index_name='notes')
+
+    assert cache.invalidate_index('docs') == 1
+    assert cache.lookup([1.0, 0.0], 'agent', 'docs', threshold=0.9) is None
+    assert cache.lookup([1.0, 0.0], 'agent', 'notes', threshold=0.9) == 'other index'
+
+    cache.update('q', [1.0, 0.0], 'fresh answer', scope='agent', index_name='docs')
+    assert cache.lookup([1.0, 0.0], 'agent', 'docs', threshold=0.9) == 'fresh answer'
+
+def test_only_the_newest_entries_per_scope_are_kept(tmp_path):
+    cache = SemanticCache(str(tmp_path / 'semantic.sqlite'), max_entries_per_scope=1)
+    cache.update('first', [1.0, 0.0], 'first answer', scope='agent', index_name='docs')
+    cache.update('second', [0.0, 1.0], 'second answer', scope='agent', index_name='docs')
+
+    assert cache.lookup([1.0, 0.0], 'agent', 'docs', threshold=0.9) is None
+    assert cache.lookup([0.0, 1.0], 'agent', 'docs', threshold=0.9) == 'second answer'
@@ -0,0 +1,148 @@
+import asyncio
+import itertools
+import threading
+import time
+
+import pytest
+
+from src.utils.single_flight import SingleFlight
+
+def test_concurrent_calls_share_one_result():
+    flight, release, calls = SingleFlight(), threading.Event(), []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return 'result'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do('key', fn))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == ['result'] * 4
+    assert calls == [1]
+
+def test_cancelling_the_first_caller_does_not_cancel_the_others():
+    async def main():
+        flight, release, calls = SingleFlight(), asyncio.Event(), []
+
+        async def fn():
+            calls.append(1)
+            await release.wait()
+            return 'result'
+
+        leader = asyncio.ensure_future(flight.ado('key', fn))
+        follower = asyncio.ensure_future(flight.ado('key', fn))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert await follower == 'result'
+        assert leader.cancelled()
+        assert calls == [1]
+
+    asyncio.run(main())
+
+def test_call_is_cancelled_once_every_caller_is():
+    async def main():
+        flight, cancelled = SingleFlight(), asyncio.Event()
+
+        async def fn():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        callers = [asyncio.ensure_future(flight.ado('key', fn)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+
+        async def again():
+            return 'fresh'
+        assert await flight.ado('key', again) == 'fresh'
+
+    asyncio.run(main())
+
+def test_failures_reach_every_caller():
+    async def main():
+        flight = SingleFlight()
+
+        async def fn():
+            await asyncio.sleep(0.01)
+            raise ValueError('boom')
+
+        results = await asyncio.gather(flight.ado('key', fn), flight.ado('key', fn), return_exceptions=True)
+        assert [type(result) for result in results] == [ValueError, ValueError]
+
+    asyncio.run(main())
+
+def test_late_subscribers_replay_the_stream_from_the_start():
+    async def main():
+        flight, release = SingleFlight(), asyncio.Event()
+
+        async def fn():
+            yield 1
+            await release.wait()
+            yield 2
+
+        first = flight.astream('key', fn)
+        assert await first.__anext__() == 1
+        second = flight.astream('key', fn)
+        assert await second.__anext__() == 1
+        release.set()
+        assert [item async for item in first] == [2]
+        assert [item async for item in second] == [2]
+
+    asyncio.run(main())
+
+def test_async_stream_stops_once_every_subscriber_leaves():
+    async def main():
+        flight, closed = SingleFlight(), asyncio.Event()
+
+        async def fn():
+            try:
+                for item in itertools.count():
+                    yield item
+                    await asyncio.sleep(0.01)
+            finally:
+                closed.set()
+
+        subscribers = [flight.astream('key', fn) for _ in range(2)]
+        for subscriber in subscribers:
+            assert await subscriber.__anext__() == 0
+        await subscribers[0].aclose()
+        await asyncio.sleep(0.05)
+        assert not closed.is_set()
+        await subscribers[1].aclose()
+        await asyncio.wait_for(closed.wait(), 1)
+
+    asyncio.run(main())
+
+def test_sync_stream_closes_the_upstream_generator_once_every_subscriber_leaves():
+    flight, closed = SingleFlight(), threading.Event()
+
+    def fn():
+        try:
+            for item in itertools.count():
+                yield item
+                time.sleep(0.01)
+        finally:
+            closed.set()
+
+    stream = flight.stream('key', fn)
+    assert list(itertools.islice(stream, 3)) == [0, 1, 2]
+    stream.close()
+    assert closed.wait(2)
+    assert list(itertools.islice(flight.stream('key', fn), 1)) == [0]
+
+@pytest.mark.parametrize('items', [[], ['only']])
+def test_sync_stream_delivers_everything(items):
+    assert list(SingleFlight().stream('key', lambda: iter(items))) == items
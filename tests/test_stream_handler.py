@@ -0,0 +1,91 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+import streamlit as st
+from langchain.memory import ConversationBufferMemory
+from langchain_core.outputs import Generation, LLMResult
+
+from src.utils import stream_handler
+from src.utils.memory_handler import MemoryHandler
+from streamlit.runtime.scriptrunner_utils.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
+from src.utils.stream_handler import StreamHandler, get_streamhandler_cb
+
+def test_callbacks_restore_the_threads_script_context(monkeypatch):
+    session_ctx, loop_ctx = object(), object()
+    monkeypatch.setattr(stream_handler, 'get_script_run_ctx', lambda *args, **kwargs: session_ctx)
+    handler = get_streamhandler_cb()
+    seen = []
+    monkeypatch.setattr(StreamHandler, 'flush', lambda self: seen.append(
+        getattr(threading.current_thread(), SCRIPT_RUN_CONTEXT_ATTR_NAME, None)))
+
+    after = []
+    def run(ctx):
+        thread = threading.current_thread()
+        setattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, ctx)
+        handler.on_llm_error(RuntimeError('boom'))
+        after.append(getattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, None))
+
+    for ctx in (loop_ctx, None):
+        thread = threading.Thread(target=run, args=(ctx,))
+        thread.start()
+        thread.join()
+
+    assert seen == [session_ctx, session_ctx]
+    assert after == [loop_ctx, None]
+
+@pytest.fixture
+def memory_handler(monkeypatch):
+    handler = MemoryHandler(ConversationBufferMemory(return_messages=True))
+    handler.add_ai_message('', {})
+    monkeypatch.setattr(st.session_state, 'memory_handler', handler, raising=False)
+    return handler
+
+def make_stream_handler(**kwargs):
+    handler = StreamHandler(**kwargs)
+    rendered = []
+    handler.llm_container = SimpleNamespace(markdown=rendered.append)
+    return handler, rendered
+
+def test_tokens_are_coalesced_and_rendered_from_the_buffer(memory_handler):
+    handler, rendered = make_stream_handler(flush_interval=3600, flush_tokens=2)
+    message = memory_handler.memory_cache.chat_memory.messages[-1]
+    for token in ['a', 'b', 'c', 'd', 'e']:
+        handler.on_llm_new_token(token)
+
+    assert rendered == ['ab', 'abcd']
+    # Rendering reads the streaming buffer; the message is only materialized at the end of the run
+    assert message.content == ''
+    handler.on_llm_end(LLMResult(generations=[[]]))
+    assert rendered[-1] == 'abcde'
+    assert message.content == 'abcde'
+
+def test_flush_thresholds_and_the_final_flush(memory_handler, monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(stream_handler, 'time', SimpleNamespace(monotonic=lambda: now[0]))
+    handler, rendered = make_stream_handler(flush_interval=0.05, flush_tokens=3)
+
+    handler.on_llm_new_token('a', run_id='run')
+    handler.on_llm_new_token('b', run_id='run')
+    assert rendered == []
+    # `flush_interval` elapsed: the next token flushes everything pending
+    now[0] = 0.05
+    handler.on_llm_new_token('c', run_id='run')
+    assert rendered == ['abc']
+    # `flush_tokens` pending: flushed without waiting for the interval
+    for token in ['d', 'e', 'f']:
+        handler.on_llm_new_token(token, run_id='run')
+    assert rendered == ['abc', 'abcdef']
+    handler.on_llm_new_token('g', run_id='run')
+    assert rendered == ['abc', 'abcdef']
+    # The run's end flushes the remainder
+    handler.on_llm_end(LLMResult(generations=[[]]), run_id='run')
+    assert rendered[-1] == 'abcdefg'
+    assert memory_handler.memory_cache.chat_memory.messages[-1].content == 'abcdefg'
+
+def test_runs_without_streamed_tokens_render_the_final_text(memory_handler):
+    handler, rendered = make_stream_handler()
+    handler.on_llm_end(LLMResult(generations=[[Generation(text='cached answer')]]), run_id='cached')
+
+    assert rendered == ['cached answer']
+    assert memory_handler.memory_cache.chat_memory.messages[-1].content == 'cached answer'
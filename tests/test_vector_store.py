@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+
+import pytest
+from pinecone.exceptions import PineconeApiException
+
+from src.rag.vector_store import PineconeStore
+
+class FakeIndex:
+    """ Just enough of a Pinecone index for the metadata-only fetch paths. """
+    def __init__(self, records, list_error=None):
+        self.records = records
+        self.list_error = list_error
+        self.filters = []
+
+    def list(self, prefix=None, namespace=None):
+        if self.list_error is not None:
+            raise self.list_error
+        yield [record_id for record_id in self.records if record_id.startswith(prefix)]
+
+    def fetch(self, ids, namespace=None):
+        return SimpleNamespace(vectors={i: SimpleNamespace(metadata=self.records[i]) for i in ids if i in self.records})
+
+    def describe_index_stats(self):
+        return {'dimension': 3}
+
+    def query(self, vector, top_k, filter, include_metadata, namespace=None):
+        self.filters.append(filter)
+        # Matches come back in no particular order, like a query with a placeholder vector
+        matches = sorted((i for i, m in self.records.items() if _matches(m, filter)), key=lambda i: hash(i) % 7)
+        return SimpleNamespace(matches=[SimpleNamespace(id=i, metadata=self.records[i]) for i in matches[:top_k]])
+
+def _matches(metadata, filter):
+    if '$and' in filter:
+        return all(_matches(metadata, part) for part in filter['$and'])
+    ops = {'$eq': lambda a, b: a == b, '$gt': lambda a, b: a > b, '$lte': lambda a, b: a <= b}
+    return all(key in metadata and all(ops[op](metadata[key], operand) for op, operand in condition.items())
+               for key, condition in filter.items())
+
+def make_store(index) -> PineconeStore:
+    store = PineconeStore.__new__(PineconeStore)
+    store._index, store._namespace, store._text_key, store.index_name = index, None, 'text', 'test-index'
+    return store
+
+RECORDS = {
+    'a.pdf#1': {'source': 'a.pdf', 'chunk_id': 1, 'text': 'second'},
+    'a.pdf#0': {'source': 'a.pdf', 'chunk_id': 0, 'text': 'first'},
+    'b.pdf#0': {'source': 'b.pdf', 'chunk_id': 0, 'text': 'other'},
+}
+
+def texts(docs):
+    return [doc.page_content for doc in docs]
+
+def test_fetch_source_lists_ids_and_orders_by_chunk_id():
+    assert texts(make_store(FakeIndex(RECORDS)).fetch_source('a.pdf')) == ['first', 'second']
+
+def test_fetch_source_falls_back_to_metadata_when_listing_is_unsupported():
+    index = FakeIndex(RECORDS, list_error=PineconeApiException(status=400, reason='Bad Request'))
+    assert texts(make_store(index).fetch_source('a.pdf')) == ['first', 'second']
+
+@pytest.mark.parametrize('status', [401, 500])
+def test_fetch_source_raises_other_errors(status):
+    index = FakeIndex(RECORDS, list_error=PineconeApiException(status=status, reason='error'))
+    with pytest.raises(PineconeApiException):
+        make_store(index).fetch_source('a.pdf')
+
+def test_metadata_fetch_pages_by_ascending_chunk_id_windows():
+    records = {f'big.pdf#{i}': {'source': 'big.pdf', 'chunk_id': i, 'text': str(i)} for i in range(23)}
+    records.update(RECORDS)
+    index = FakeIndex(records)
+    docs = make_store(index).fetch_by_metadata({'source': {'$eq': 'big.pdf'}}, page_size=4)
+
+    assert sorted(int(doc.page_content) for doc in docs) == list(range(23))
+    # Pages are bounded ranges, never a growing exclusion list
+    assert all('$nin' not in str(filter) for filter in index.filters)